@@ -1,19 +1,55 @@
+import time
+APP_START_TIME = time.perf_counter() # Taken before any other import, for the startup time measurement
+
 import customtkinter as ctk
 import tkinter as tk
 from tkinter import scrolledtext
+from tkinter import filedialog
 import random
-import time
 import multiprocessing
-import re
+import queue
+import threading
 import os
-
-from utility.getmodels import get_local_llm_models
-from utility.runllm import run_llm_inference
-from utility.startollama import start_ollama_process
+import collections
+
+from utility.detectollama import detect_ollama
+from utility.llmworker import InferenceWorker
+from utility.conversation import Conversation, estimate_tokens
+from utility.responsecache import ResponseCache
+from utility.appdata import app_data_path
+from utility.telemetry import GenerationTelemetry, MetricsLog, build_metrics, format_metrics
+from utility.transport import get_transport
+from utility.chatview import ChatView
+from utility.streammarkdown import configure_markdown_tags
+from utility.chatstore import ChatStore
+from utility.historywindow import HistoryWindow
+from utility.comparewindow import CompareWindow
+from utility.docindex import DocumentIndex
+from utility.mapreduce import is_long_input, split_instruction
+from utility.ollamasupervisor import OllamaSupervisor, format_server_status
+from utility.modelresidency import ModelResidencyManager, format_resident_models, DEFAULT_MAX_RESIDENT, BYTES_PER_GB
+
+# Streaming render tuning
+POLL_INTERVAL_STREAMING_MS = 16  # About one frame at 60 Hz while tokens are arriving
+POLL_INTERVAL_IDLE_MAX_MS = 250  # Back-off ceiling when the stream goes quiet (model loading, slow models)
+UI_BUDGET_PER_TICK_MS = 8        # Max time a tick may spend draining the queue before yielding to Tk
+
+STARTUP_POLL_MS = 100 # How often the UI checks for results of the background Ollama detection
+RESIDENCY_POLL_MS = 250 # How often the UI checks for model load progress and the resident model list
+INDEXING_POLL_MS = 200 # How often the UI checks on document indexing while it runs
+SUPERVISOR_POLL_MS = 500 # How often the UI picks up health and resource samples of the Ollama server
+
+# Residency policy choices: models kept loaded and their memory budget
+MAX_RESIDENT_OPTIONS = ["1", "2", "3", "4"]
+MEMORY_BUDGET_OPTIONS = {"No memory limit": 0, "4 GB": 4, "8 GB": 8, "16 GB": 16, "32 GB": 32}
+
+# Placeholder entries of the model dropdown
+DETECTING_MODELS_OPTION = "Detecting models..."
+NO_MODELS_OPTION = "No local models found (Start Ollama manually)"
 
 # --- Main Application Class ---
 class LLMChatApp(ctk.CTk):
-    def __init__(self):
+    def __init__(self, auto_start_ollama=True):
         
         ctk.set_appearance_mode("Light") # System, Dark, Light
         ctk.set_default_color_theme("blue") # blue, dark-blue, green
@@ -34,6 +70,7 @@ class LLMChatApp(ctk.CTk):
         self.rowconfigure(1, weight=0)  
         self.rowconfigure(2, weight=0)  
         self.rowconfigure(3, weight=0)  
+        self.rowconfigure(4, weight=0)  
         self.columnconfigure(0, weight=1) 
         self.columnconfigure(1, weight=0) 
 
@@ -60,12 +97,15 @@ class LLMChatApp(ctk.CTk):
         self.chat_history.tag_config("green", foreground="green")
         self.chat_history.tag_config("orange", foreground="orange")
         self.chat_history.tag_config("black", foreground="black") 
-        self.chat_history.tag_config("bold", font=("Helvetica", 12, "bold"), foreground="black") 
-        self.chat_history.tag_config("italic", font=("Helvetica", 12, "italic"), foreground="black")
-        self.chat_history.tag_config("h1", font=("Helvetica", 20, "bold"), foreground="black") 
-        self.chat_history.tag_config("h2", font=("Helvetica", 18, "bold"), foreground="black") 
-        self.chat_history.tag_config("h3", font=("Helvetica", 16, "bold"), foreground="black") 
-        self.chat_history.tag_config("list_item", lmargin1=20, lmargin2=40, foreground="black") 
+        self.chat_history.tag_config("red", foreground="red")
+        configure_markdown_tags(self.chat_history)
+
+        # Conversations are saved in a local database, written in the background
+        self.chat_store = ChatStore(app_data_path("chats.sqlite3"))
+        self.session_id = None # Stored session of the current chat, created with its first message
+
+        # Only the newest messages are kept as Tk text, older ones are rendered on demand
+        self.chat_view = ChatView(self.chat_history, body_loader=self.chat_store.load_bodies)
 
 ######## This part show thinking label in the main window
         # Thinking Status Label 
@@ -76,7 +116,16 @@ class LLMChatApp(ctk.CTk):
             text_color="gray",
             wraplength=800
         )
-        self.status_label.grid(row=1, column=0, columnspan=2, padx=10, pady=(0, 5), sticky="w")
+        self.status_label.grid(row=1, column=0, padx=10, pady=(0, 5), sticky="w")
+
+        # Performance of the last answer, next to the status
+        self.metrics_label = ctk.CTkLabel(
+            self,
+            text="",
+            font=("Helvetica", 12),
+            text_color="gray"
+        )
+        self.metrics_label.grid(row=1, column=1, padx=10, pady=(0, 5), sticky="e")
 
 ####### This part will take | User Input | Send | Stop
         # Input Frame
@@ -96,6 +145,7 @@ class LLMChatApp(ctk.CTk):
         self.user_input.insert("0.0", "Type your message...") 
         self.user_input.grid(row=0, column=0, padx=(10, 5), pady=10, sticky="ew")
         self.user_input.bind("<Return>", self.handle_enter_key) #This if i want to bind enter key
+        self.user_input.bind("<Control-Return>", self.handle_priority_send) # Send now, interrupting the current answer
 
         self.send_button = ctk.CTkButton(
             self.input_frame,
@@ -126,40 +176,44 @@ class LLMChatApp(ctk.CTk):
         self.control_panel.grid(row=3, column=0, padx=10, pady=(10, 10), sticky="ew", columnspan=2)
         self.control_panel.columnconfigure((0, 1, 2), weight=1) 
 
-                # Multiprocessing variables
-        self.response_queue = multiprocessing.Queue()
-        self.llm_process = None
-        self.current_llm_full_response = "" # Accumulates the full response for final Markdown parsing
-        self.llm_response_content_start_idx = None # To store the Text widget index where LLM content starts
+                # Inference worker variables
+        self.response_queue = queue.Queue()
+        self.response_cache = ResponseCache(app_data_path("response_cache")) # Answers of deterministic prompts
+        self.document_index = DocumentIndex(app_data_path("documents")) # Local files for retrieval, loaded lazily
+        self.llm_worker = InferenceWorker(
+            self.response_queue, response_cache=self.response_cache, document_index=self.document_index
+        ) # Started once, reused for every prompt
+        self.llm_worker.start()
+        self.active_request_id = None # Tokens tagged with any other id are stale and dropped
+        self.prompt_queue = collections.deque() # Prompts sent while an answer was still streaming
+        self.poll_after_id = None # Pending Tk timer of the response poller
+        self.poll_interval_ms = POLL_INTERVAL_STREAMING_MS
+        self.last_ui_tick_ms = 0.0 # Measured UI work of the last poll tick
+        self.current_llm_full_response = "" # Accumulates the full response text
+        self.conversation = Conversation() # Turns and Ollama context vector of the current chat
+        self.current_user_text = "" # Prompt of the active request, recorded with its answer
+        self.current_generation_info = None # Final generation info (context, token counts) of the active request
+        self.current_telemetry = None # Timings of the active request
+        self.metrics_log = MetricsLog(app_data_path("metrics.jsonl")) # One JSON line per finished answer
         self.ollama_server_process = None # To store the Popen object of the Ollama server process
-
-        # --- Attempt to start Ollama if not running ---
-        ollama_running, detected_models = get_local_llm_models() # Get the boolean and the list
-        if not ollama_running:
-            #print("Ollama server not detected. Attempting to start...")
-            self.display_message("System", "Attempting to start Ollama server...", "blue")
-            self.ollama_server_process = start_ollama_process()
-            if self.ollama_server_process:
-                # Give Ollama some time to start up and become responsive
-                startup_attempts = 0
-                max_attempts = 30 # Try for up to 3 seconds (30 * 0.1s)
-                while startup_attempts < max_attempts:
-                    time.sleep(0.1) # Wait 100ms
-                    ollama_running, detected_models = get_local_llm_models() # Re-check
-                    if ollama_running:
-                        self.display_message("System", "Ollama server started successfully. Fetching models...", "blue")
-                        break
-                    startup_attempts += 1
-                if not ollama_running:
-                    error_msg = "Failed to start Ollama server or connect to it. Please start Ollama manually."
-                    #print(error_msg)
-                    self.display_message("System", error_msg, "red")
-            else:
-                error_msg = "Could not initiate Ollama server startup process. Check your Ollama installation and PATH."
-                #print(error_msg)
-                self.display_message("System", error_msg, "red")
-
-        self.model_options = detected_models if detected_models else ["No local models found (Start Ollama manually)"]
+        self.auto_start_ollama = auto_start_ollama
+        self.ollama_log_path = app_data_path("logs", "ollama_server.log") # Output of a server started by the app
+        self.supervisor_queue = queue.Queue() # Health checks and resource samples of the server
+        self.ollama_supervisor = None # Started once the server is up
+
+        self.startup_queue = queue.Queue() # Results of the background Ollama detection
+
+        # Models are preloaded when selected and unloaded least recently used first
+        self.residency_queue = queue.Queue()
+        self.model_residency = ModelResidencyManager(self.residency_queue)
+        self.model_residency.start()
+        self.loading_model = None # Model being preloaded, with the time the load started
+        self.loading_started = None
+        self.generating_model = None # Model of the active request, protected from unloading
+        self.startup_time_ms = None # Launch until the window is ready
+        self.models_ready_time_ms = None # Launch until the model list arrived
+
+        self.model_options = [DETECTING_MODELS_OPTION] # Filled in by the background detection
         
         # Model Selection
         self.model_label = ctk.CTkLabel(self.control_panel, text="Choose Model:", font=("Helvetica", 12))
@@ -170,6 +224,7 @@ class LLMChatApp(ctk.CTk):
             self.control_panel,
             values=self.model_options,
             variable=self.selected_model,
+            command=self.on_model_selected,
             width=180,
             font=("Helvetica", 12)
         )
@@ -196,16 +251,414 @@ class LLMChatApp(ctk.CTk):
         )
         self.temperature_value_label.grid(row=1, column=2, padx=10, pady=5, sticky="w")
 
+        # Conversation memory
+        self.memory_enabled = ctk.BooleanVar(value=True)
+        self.memory_switch = ctk.CTkSwitch(
+            self.control_panel,
+            text="Remember conversation",
+            variable=self.memory_enabled,
+            font=("Helvetica", 12)
+        )
+        self.memory_switch.grid(row=2, column=0, columnspan=2, padx=10, pady=5, sticky="w")
+
+        self.new_chat_button = ctk.CTkButton(
+            self.control_panel,
+            text="New Chat",
+            command=self.start_new_chat,
+            width=100,
+            font=("Helvetica", 12)
+        )
+        self.new_chat_button.grid(row=2, column=2, padx=10, pady=5, sticky="e")
+
+        self.history_button = ctk.CTkButton(
+            self.control_panel,
+            text="History",
+            command=self.show_history,
+            width=100,
+            font=("Helvetica", 12)
+        )
+        self.history_button.grid(row=0, column=2, padx=10, pady=5, sticky="e")
+
+        self.compare_button = ctk.CTkButton(
+            self.control_panel,
+            text="Compare",
+            command=self.show_compare,
+            width=100,
+            font=("Helvetica", 12)
+        )
+        self.compare_button.grid(row=1, column=2, padx=10, pady=5, sticky="e")
+
+        # Response cache, only used when temperature is 0 or a seed is fixed
+        self.cache_enabled = ctk.BooleanVar(value=True)
+        self.cache_switch = ctk.CTkSwitch(
+            self.control_panel,
+            text="Cache answers (temperature 0 or fixed seed)",
+            variable=self.cache_enabled,
+            font=("Helvetica", 12)
+        )
+        self.cache_switch.grid(row=3, column=0, columnspan=2, padx=10, pady=5, sticky="w")
+
+        self.seed_entry = ctk.CTkEntry(
+            self.control_panel,
+            placeholder_text="Seed (optional)",
+            width=120,
+            font=("Helvetica", 12)
+        )
+        self.seed_entry.grid(row=3, column=2, padx=10, pady=5, sticky="e")
+
+        # Residency policy: how many models stay loaded, and within which memory budget
+        self.keep_loaded_label = ctk.CTkLabel(self.control_panel, text="Keep models loaded:", font=("Helvetica", 12))
+        self.keep_loaded_label.grid(row=4, column=0, padx=10, pady=5, sticky="w")
+
+        self.max_resident = ctk.StringVar(value=str(DEFAULT_MAX_RESIDENT))
+        self.max_resident_menu = ctk.CTkOptionMenu(
+            self.control_panel,
+            values=MAX_RESIDENT_OPTIONS,
+            variable=self.max_resident,
+            command=self.update_residency_policy,
+            width=80,
+            font=("Helvetica", 12)
+        )
+        self.max_resident_menu.grid(row=4, column=1, padx=10, pady=5, sticky="w")
+
+        self.memory_budget = ctk.StringVar(value="No memory limit")
+        self.memory_budget_menu = ctk.CTkOptionMenu(
+            self.control_panel,
+            values=list(MEMORY_BUDGET_OPTIONS),
+            variable=self.memory_budget,
+            command=self.update_residency_policy,
+            width=120,
+            font=("Helvetica", 12)
+        )
+        self.memory_budget_menu.grid(row=4, column=2, padx=10, pady=5, sticky="e")
+
+        # Models resident in Ollama and their memory
+        self.residency_label = ctk.CTkLabel(
+            self.control_panel,
+            text="",
+            font=("Helvetica", 12),
+            text_color="gray"
+        )
+        self.residency_label.grid(row=5, column=0, columnspan=3, padx=10, pady=(0, 5), sticky="w")
+
+        # Local documents: relevant chunks are added to the prompt instead of pasting whole files
+        self.documents_enabled = ctk.BooleanVar(value=False)
+        self.documents_switch = ctk.CTkSwitch(
+            self.control_panel,
+            text="Answer from my documents",
+            variable=self.documents_enabled,
+            font=("Helvetica", 12)
+        )
+        self.documents_switch.grid(row=6, column=0, padx=10, pady=5, sticky="w")
+
+        self.add_folder_button = ctk.CTkButton(
+            self.control_panel,
+            text="Add folder...",
+            command=lambda: self.add_documents(folder=True),
+            width=100,
+            font=("Helvetica", 12)
+        )
+        self.add_folder_button.grid(row=6, column=1, padx=10, pady=5, sticky="e")
+
+        self.add_files_button = ctk.CTkButton(
+            self.control_panel,
+            text="Add files...",
+            command=self.add_documents,
+            width=100,
+            font=("Helvetica", 12)
+        )
+        self.add_files_button.grid(row=6, column=2, padx=10, pady=5, sticky="e")
+
+        self.indexing_queue = queue.Queue() # Progress of the background document indexing
+        self.indexing = False
+
+        # Health, CPU and memory of the Ollama server
+        self.server_label = ctk.CTkLabel(
+            self.control_panel,
+            text="",
+            font=("Helvetica", 12),
+            text_color="gray"
+        )
+        self.server_label.grid(row=7, column=0, columnspan=3, padx=10, pady=(0, 5), sticky="w")
+
         # Initial message
         self.display_message("I am BOT Octopus!", "Here to assist you with anything you need!", "blue")
 
         # Add a cleanup handler for when the app closes
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
+
+        # --- Detect (and if needed start) Ollama without blocking the window ---
+        threading.Thread(
+            target=detect_ollama,
+            args=(self.startup_queue, auto_start_ollama, self.ollama_log_path),
+            name="OllamaDetection",
+            daemon=True
+        ).start()
+        self.after(STARTUP_POLL_MS, self.poll_startup_queue)
+        self.after(RESIDENCY_POLL_MS, self.poll_residency_queue)
+        self.after_idle(self._record_startup_time)
+
+        # Pick up changes of already indexed documents
+        if DocumentIndex.available():
+            self._start_indexing(self.document_index.refresh, quiet=True)
+        else:
+            self.documents_switch.configure(text="Answer from my documents (needs numpy)", state="disabled")
+            self.add_folder_button.configure(state="disabled")
+            self.add_files_button.configure(state="disabled")
+
+    def _record_startup_time(self):
+        """Measures the time from launch until the window is ready and shows it."""
+        self.startup_time_ms = (time.perf_counter() - APP_START_TIME) * 1000.0
+        if self.active_request_id is None:
+            self.status_label.configure(text=f"Window ready in {self.startup_time_ms:.0f} ms", text_color="gray")
+
+    def poll_startup_queue(self):
+        """Applies results of the background Ollama detection to the UI."""
+        while True:
+            try:
+                kind, payload = self.startup_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == "status":
+                self.display_message("System", payload, "blue")
+            elif kind == "server_process":
+                self.ollama_server_process = payload
+            elif kind == "models":
+                self.models_ready_time_ms = (time.perf_counter() - APP_START_TIME) * 1000.0
+                self._start_supervisor()
+                self.set_model_options(payload)
+                self.on_model_selected(self.selected_model.get()) # Load the default model before the first prompt
+                if self.active_request_id is None:
+                    self.status_label.configure(
+                        text=f"Ollama ready with {len(payload)} model(s), {self.models_ready_time_ms:.0f} ms after launch",
+                        text_color="gray"
+                    )
+                return
+            elif kind == "error":
+                #print(payload)
+                self.set_model_options([])
+                self.display_message("System", payload, "red")
+                return
+
+        self.after(STARTUP_POLL_MS, self.poll_startup_queue)
+
+    def _start_supervisor(self):
+        """Starts watching the server; it is restarted on failure only if the app may start Ollama."""
+        self.ollama_supervisor = OllamaSupervisor(
+            self.supervisor_queue,
+            process=self.ollama_server_process,
+            log_path=self.ollama_log_path,
+            can_restart=self.auto_start_ollama
+        )
+        self.ollama_supervisor.start()
+        self.after(SUPERVISOR_POLL_MS, self.poll_supervisor_queue)
+
+    def poll_supervisor_queue(self):
+        """Shows the server's health and resource use, and reports failures and restarts."""
+        if self.ollama_supervisor is None:
+            return # Shutting down
+        while True:
+            try:
+                kind, payload = self.supervisor_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == "status":
+                self.server_label.configure(text=format_server_status(payload))
+            elif kind == "down":
+                if self.auto_start_ollama:
+                    payload += " Restarting it..."
+                self.display_message("System", payload, "red")
+            elif kind == "restarted":
+                self.display_message("System", "Ollama server restarted.", "blue")
+                self.on_model_selected(self.selected_model.get()) # Loaded models were lost with the old server
+
+        self.after(SUPERVISOR_POLL_MS, self.poll_supervisor_queue)
+
+    def set_model_options(self, models):
+        """Fills the model dropdown, keeping the current choice when it is still available."""
+        self.model_options = models if models else [NO_MODELS_OPTION]
+        self.model_dropdown.configure(values=self.model_options)
+        if self.selected_model.get() not in self.model_options:
+            self.selected_model.set(self.model_options[0])
  
+    def on_model_selected(self, model):
+        """Preloads the chosen model so the first prompt does not wait for it to load."""
+        if model in (DETECTING_MODELS_OPTION, NO_MODELS_OPTION):
+            return
+        self.model_residency.preload(model)
+
+    def update_residency_policy(self, _value=None):
+        """Applies the chosen number of resident models and memory budget."""
+        self.model_residency.set_policy(
+            max_models=int(self.max_resident.get()),
+            memory_budget_bytes=MEMORY_BUDGET_OPTIONS[self.memory_budget.get()] * BYTES_PER_GB
+        )
+
+    def poll_residency_queue(self):
+        """Shows model load progress and the models resident in Ollama."""
+        while True:
+            try:
+                kind, payload = self.residency_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == "loading":
+                self.loading_model = payload
+                self.loading_started = time.perf_counter()
+            elif kind == "loaded":
+                model, load_ms = payload
+                self.loading_model = None
+                if self.active_request_id is None:
+                    self.status_label.configure(text=f"{model} loaded in {load_ms / 1000.0:.1f} s", text_color="gray")
+            elif kind == "resident":
+                self.residency_label.configure(text=format_resident_models(payload))
+            elif kind == "error":
+                #print(payload)
+                self.loading_model = None
+                self.residency_label.configure(text=payload)
+
+        # Load progress; Ollama reports none, so the elapsed time is shown
+        if self.loading_model is not None and self.active_request_id is None:
+            elapsed = time.perf_counter() - self.loading_started
+            self.status_label.configure(text=f"Loading {self.loading_model}... {elapsed:.0f} s", text_color="gray")
+
+        self.after(RESIDENCY_POLL_MS, self.poll_residency_queue)
+
+    def _release_model(self):
+        """Allows the model of the finished request to be unloaded again."""
+        if self.generating_model is not None:
+            self.model_residency.end_use(self.generating_model)
+            self.generating_model = None
+
+    def add_documents(self, folder=False):
+        """Asks for files or a folder and indexes them in the background."""
+        if folder:
+            folder_path = filedialog.askdirectory(title="Add a folder of documents")
+            paths = [folder_path] if folder_path else []
+        else:
+            paths = list(filedialog.askopenfilenames(title="Add documents"))
+        if paths:
+            self._start_indexing(lambda progress: self.document_index.add_paths(paths, progress))
+
+    def _start_indexing(self, index_function, quiet=False):
+        """Runs index_function(progress) in a background thread, one at a time."""
+        if self.indexing:
+            self.display_message("System", "Documents are still being indexed, please wait.", "red")
+            return
+        self.indexing = True
+        self.add_folder_button.configure(state="disabled")
+        self.add_files_button.configure(state="disabled")
+
+        def run():
+            try:
+                stats = index_function(lambda message: self.indexing_queue.put(("progress", message)))
+                self.indexing_queue.put(("done", (stats, quiet)))
+            except Exception as e:
+                self.indexing_queue.put(("error", f"Indexing documents failed: {e}"))
+
+        threading.Thread(target=run, name="DocumentIndexing", daemon=True).start()
+        self.after(INDEXING_POLL_MS, self.poll_indexing_queue)
+
+    def poll_indexing_queue(self):
+        """Shows indexing progress and the result."""
+        while True:
+            try:
+                kind, payload = self.indexing_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == "progress":
+                if self.active_request_id is None:
+                    self.status_label.configure(text=payload, text_color="gray")
+                continue
+
+            self.indexing = False
+            self.add_folder_button.configure(state="normal")
+            self.add_files_button.configure(state="normal")
+            if kind == "error":
+                self.display_message("System", payload, "red")
+            else:
+                stats, quiet = payload
+                if self.active_request_id is None:
+                    self.status_label.configure(text="", text_color="gray")
+                if not quiet or stats["added"] or stats["updated"] or stats["removed"]:
+                    self.display_message(
+                        "System",
+                        f"Documents indexed: {stats['added']} added, {stats['updated']} updated, "
+                        f"{stats['removed']} removed, {stats['unchanged']} unchanged "
+                        f"({self.document_index.file_count()} files, {len(self.document_index)} chunks).",
+                        "blue"
+                    )
+                if stats["added"] and not quiet:
+                    self.documents_enabled.set(True)
+            return
+
+        self.after(INDEXING_POLL_MS, self.poll_indexing_queue)
+
     def update_temperature_label(self, value):
         """Updates the temperature value label next to the slider."""
         self.temperature_value_label.configure(text=f"{value:.2f}")
 
+    def get_seed(self):
+        """Returns the seed typed by the user as int, or None for a random seed."""
+        seed_text = self.seed_entry.get().strip()
+        if not seed_text:
+            return None
+        try:
+            return int(seed_text)
+        except ValueError:
+            self.display_message("System", f"Ignoring seed '{seed_text}', it must be a whole number.", "red")
+            return None
+
+    def start_new_chat(self):
+        """Stops any running generation and forgets the conversation so far."""
+        self.prompt_queue.clear()
+        self.stop_llm_generation(force_silent=True)
+        self.conversation.reset()
+        self.session_id = None
+        self.chat_view.clear()
+        self.display_message("System", "Started a new conversation.", "blue")
+
+    def show_history(self):
+        """Opens the list of stored conversations."""
+        HistoryWindow(self, self.chat_store, on_open=self.open_session)
+
+    def show_compare(self):
+        """Opens compare mode: one prompt answered by several models side by side."""
+        if self.model_options[0] in (DETECTING_MODELS_OPTION, NO_MODELS_OPTION):
+            self.display_message("System", "No models available to compare yet.", "red")
+            return
+        window = CompareWindow(
+            self, self.model_options,
+            model_residency=self.model_residency,
+            metrics_log=self.metrics_log,
+            temperature=self.temperature_slider.get()
+        )
+        window.prompt_input.insert("0.0", self.user_input.get("0.0", "end").strip())
+
+    def open_session(self, session_id):
+        """Shows a stored conversation; only the visible message bodies are loaded."""
+        self.prompt_queue.clear()
+        self.stop_llm_generation(force_silent=True)
+        records = self.chat_store.load_message_headers(session_id)
+        self.chat_view.load_records(records)
+        self.session_id = session_id
+
+        # Continue the conversation from the question/answer pairs that were loaded
+        turns = []
+        for question, answer in zip(records, records[1:]):
+            if question["sender"] == "You" and answer["sender"] == "BOT Octopus" and question["text"] is not None:
+                turns.append((question["text"], answer["text"]))
+        self.conversation.restore(turns)
+
+    def _store_message(self, sender, text, tag, markdown=False):
+        """Saves a chat message, starting a stored session with the first one."""
+        if self.session_id is None:
+            self.session_id = self.chat_store.new_session(text)
+        self.chat_store.add_message(self.session_id, sender, text, tag, markdown)
+
     def handle_enter_key(self, event=None):
         """Handles Enter key press in the multiline input."""
         if event.state & 0x1: 
@@ -214,11 +667,23 @@ class LLMChatApp(ctk.CTk):
             self.send_message()
             return "break" 
 
+    def handle_priority_send(self, event=None):
+        """Ctrl + Enter: stops the current answer and sends this prompt before any queued ones."""
+        self.send_message(priority=True)
+        return "break"
+
     def on_closing(self):
         """
-        Cleans up the Ollama subprocess if it was started by the application.
+        Stops the inference worker and cleans up the Ollama subprocess if it was
+        started by the application.
         This method is called when the application window is closed.
         """
+        self.llm_worker.shutdown()
+        self.model_residency.shutdown()
+        self.chat_store.close() # Writes what is still queued
+        if self.ollama_supervisor is not None:
+            self.ollama_supervisor.shutdown() # Stops a server the app started, including restarted ones
+            self.ollama_supervisor = None
         if self.ollama_server_process and self.ollama_server_process.poll() is None: # Check if still running
             #print("Terminating Ollama server process started by the application...")
             try:
@@ -229,173 +694,267 @@ class LLMChatApp(ctk.CTk):
                     self.ollama_server_process.kill()          # Force kill if necessary
             except Exception as e:
                 #print(f"Error terminating Ollama process: {e}")
-                self.display_message(f"Error terminating Ollama process: {e}")
-            self.destroy() # Close the CTkinter window
+                self.display_message("System", f"Error terminating Ollama process: {e}", "red")
+        self.destroy() # Close the CTkinter window
 
 
-    def send_message(self):
-        """Sends the user's message and initiates LLM response in a new process."""
+    def send_message(self, priority=False):
+        """
+        Sends the user's message. While an answer is streaming the prompt is
+        queued behind it; with priority the current answer is stopped and the
+        prompt goes first.
+        """
         user_text = self.user_input.get("0.0", "end").strip() 
         if not user_text:
             return 
 
-        # Display user message first
-        self.chat_history.configure(state='normal')
-        self.chat_history.insert(tk.END, f"You: {user_text}\n\n", "green")
-        self.chat_history.configure(state='disabled')
-        self.chat_history.see(tk.END)
-
         self.user_input.delete("0.0", "end") # Clear input field
 
-        
-        self.stop_llm_generation(force_silent=True) 
+        # Model and settings are taken now, as the user sees them when sending
+        prompt_job = {
+            "text": user_text,
+            "model": self.selected_model.get(),
+            "temperature": self.temperature_slider.get(),
+            "seed": self.get_seed(),
+            "use_cache": self.cache_enabled.get(),
+        }
+
+        if self.active_request_id is None:
+            self._start_prompt(prompt_job)
+        elif priority:
+            self.prompt_queue.appendleft(prompt_job)
+            # The stream is closed cooperatively; the next prompt starts once the UI is updated
+            self.stop_llm_generation(force_silent=True)
+            self.chat_view.add_message(None, "Interrupted by a newer prompt.", "red")
+            self._start_next_prompt()
+        else:
+            self.prompt_queue.append(prompt_job)
+            self._show_thinking_status()
+
+    def _start_next_prompt(self):
+        """Starts the oldest queued prompt, if any, once the previous answer is complete."""
+        if self.active_request_id is None and self.prompt_queue:
+            self._start_prompt(self.prompt_queue.popleft())
+
+    def _show_thinking_status(self):
+        waiting = len(self.prompt_queue)
+        text = "BOT Octopus: Thinking..."
+        if waiting:
+            text += f" ({waiting} prompt{'s' if waiting > 1 else ''} queued, Ctrl+Enter sends right away)"
+        self.status_label.configure(text=text, text_color="gray")
+
+    def _start_prompt(self, prompt_job):
+        """Shows the user's message and submits the LLM request to the inference worker."""
+        user_text = prompt_job["text"]
+
+        # Display user message first
+        self.chat_view.add_message("You", user_text, "green")
+        self._store_message("You", user_text, "green")
 
         # Check if a model is selected and Ollama is potentially available
-        model = self.selected_model.get()
-        if model == "No local models found (Start Ollama)":
+        model = prompt_job["model"]
+        if model in (DETECTING_MODELS_OPTION, NO_MODELS_OPTION):
             self.display_message("System", "Please start your Ollama server and pull a model before asking questions.", "red")
+            self.after_idle(self._start_next_prompt)
             return
 
-        temperature = self.temperature_slider.get()
+        temperature = prompt_job["temperature"]
 
         # Reset for new response accumulation
         self.current_llm_full_response = ""
+        self.current_user_text = user_text
+        self.current_generation_info = None
+        self.current_telemetry = GenerationTelemetry(model)
 
         # Display "Thinking..." message in the status label
-        self.status_label.configure(text="BOT Octopus: Thinking...", text_color="gray")
+        self._show_thinking_status()
         self.stop_button.configure(state="normal") 
 
         # Prepare chat history for streaming LLM response
-        self.chat_history.configure(state='normal')
-        self.chat_history.insert(tk.END, "BOT Octopus: ", "black") 
-        self.llm_response_content_start_idx = self.chat_history.index(tk.END)
-        self.chat_history.configure(state='disabled')
-        self.chat_history.see(tk.END)
-
+        self.chat_view.begin_stream("BOT Octopus", "black")
+        self.model_residency.begin_use(model)
+        self.generating_model = model
+
+        # Text too long for the context window: read it in parts, then combine
+        if is_long_input(user_text, self.conversation.num_ctx):
+            instruction, _ = split_instruction(user_text)
+            self.current_user_text = f"{instruction} [long text of about {estimate_tokens(user_text)} tokens]" # Kept short for the memory
+            self.active_request_id = self.llm_worker.submit_long(
+                user_text, model, temperature,
+                num_ctx=self.conversation.num_ctx,
+                keep_alive=self.model_residency.keep_alive
+            )
+            self.poll_interval_ms = POLL_INTERVAL_STREAMING_MS
+            self._schedule_poll(self.poll_interval_ms)
+            return
 
-        # Start LLM inference in a new process
-        self.llm_process = multiprocessing.Process(
-            target=run_llm_inference,
-            args=(user_text, model, temperature, self.response_queue)
+        # With memory on, only the new prompt and the previous context vector are sent
+        if self.memory_enabled.get():
+            prompt, context = self.conversation.prepare(model, user_text)
+        else:
+            prompt, context = user_text, None
+
+        # Hand the prompt to the already running inference worker
+        self.active_request_id = self.llm_worker.submit(
+            prompt, model, temperature,
+            context=context,
+            num_ctx=self.conversation.num_ctx,
+            seed=prompt_job["seed"],
+            use_cache=prompt_job["use_cache"],
+            keep_alive=self.model_residency.keep_alive,
+            retrieval_query=user_text if self.documents_enabled.get() else None
         )
-        self.llm_process.start()
 
-        # Start polling the queue for LLM response and check every 50ms
-        self.after(50, self.poll_llm_response_queue) 
+        # Start polling the queue for the LLM response
+        self.poll_interval_ms = POLL_INTERVAL_STREAMING_MS
+        self._schedule_poll(self.poll_interval_ms)
 
     def stop_llm_generation(self, force_silent=False):
-        """Stops the current LLM generation process."""
-        if self.llm_process and self.llm_process.is_alive():
-            self.llm_process.terminate()
-            self.llm_process.join()
-            #print("LLM process terminated by stop button.")  # only for myself Aby
-
-            # Clear any remaining items in the queue to prevent them from being processed later
-            while not self.response_queue.empty():
-                try:
-                    self.response_queue.get_nowait()
-                except multiprocessing.queues.Empty:
-                    break 
-
-            self.llm_process = None
+        """Stops the current LLM generation."""
+        if self.active_request_id is not None:
+            # The worker closes the stream after the current chunk; anything it
+            # still sends for this request is dropped by the id check in polling
+            self.llm_worker.cancel(self.active_request_id)
+            #print("LLM generation cancelled by stop button.")  # only for myself Aby
+
+            # Keep the partial answer; without a context vector the history is resent as text
+            if self.memory_enabled.get():
+                self.conversation.record(self.current_user_text, self.current_llm_full_response)
+
+            self.active_request_id = None
+            self._release_model()
             self.status_label.configure(text="") #
             self.stop_button.configure(state="disabled") 
 
+            # Format the last, partially streamed line
+            self.chat_view.end_stream(self.current_llm_full_response)
+            if self.current_llm_full_response:
+                self._store_message("BOT Octopus", self.current_llm_full_response, "black", markdown=True)
+
             if not force_silent:
                 # Add a message to chat history only if manually stopped by user
-                self.chat_history.configure(state='normal')
-                self.chat_history.insert(tk.END, "\nGeneration stopped by user.\n\n", "red")
-                self.chat_history.see(tk.END)
-                self.chat_history.configure(state='disabled')
+                self.chat_view.add_message(None, "Generation stopped by user.", "red")
             
             self.current_llm_full_response = "" 
 
+            if not force_silent:
+                self.after_idle(self._start_next_prompt) # Queued prompts still get their answer
+
+    def _schedule_poll(self, delay_ms):
+        """(Re)schedules the response poller, making sure only one timer is pending."""
+        if self.poll_after_id is not None:
+            self.after_cancel(self.poll_after_id)
+        self.poll_after_id = self.after(delay_ms, self.poll_llm_response_queue)
+
     def poll_llm_response_queue(self):
-        """Polls the queue for LLM response and updates the main window."""
-        while not self.response_queue.empty():
-            token = self.response_queue.get()
+        """
+        Polls the queue for LLM response and updates the main window.
+        All tokens pending at this tick are drained (within UI_BUDGET_PER_TICK_MS)
+        and written with a single insert, then the next tick is scheduled fast
+        while tokens flow and with a growing back-off while the stream is quiet.
+        """
+        self.poll_after_id = None
+        tick_start = time.perf_counter()
+        budget_s = UI_BUDGET_PER_TICK_MS / 1000.0
+        pending_tokens = []
+        end_of_stream = False
+        queue_drained = False
+
+        while self.active_request_id is not None:
+            if time.perf_counter() - tick_start >= budget_s:
+                break
+            try:
+                request_id, token = self.response_queue.get_nowait()
+            except queue.Empty:
+                queue_drained = True
+                break
+            if request_id != self.active_request_id:
+                continue # Left over from a cancelled request
             if token == "[END_OF_STREAM]":
-                # End of stream detected
-                self.status_label.configure(text="") 
-                self.stop_button.configure(state="disabled")
-
-                # Delete the raw streamed text from its start index to the current end
-                self.chat_history.configure(state='normal')
-                current_end_idx = self.chat_history.index(tk.END)
-                self.chat_history.delete(self.llm_response_content_start_idx, current_end_idx)
-                
-                # Insert the full accumulated response with Markdown formatting
-                self._insert_markdown_text(self.chat_history, self.current_llm_full_response, "black")
-                self.chat_history.insert(tk.END, "\n\n") 
-                self.chat_history.see(tk.END)
-                self.chat_history.configure(state='disabled')
-
-                self.llm_process.join() 
-                self.llm_process = None
-                return 
-
-            self.current_llm_full_response += token 
-
-            # Display token immediately in the chat history
-            self.chat_history.configure(state='normal')
-            self.chat_history.insert(tk.END, token, "black") 
-            self.chat_history.see(tk.END)
-            self.chat_history.configure(state='disabled')
+                end_of_stream = True
+                break
+            if isinstance(token, dict) and "progress" in token:
+                self.status_label.configure(text=token["progress"], text_color="gray") # Long text read in parts
+                continue
+            if isinstance(token, dict):
+                self.current_generation_info = token # Final generation info, sent just before the end
+                continue
+            pending_tokens.append(token)
+
+        if pending_tokens:
+            text = "".join(pending_tokens)
+            self.current_llm_full_response += text
+            self.current_telemetry.token_received()
+
+            # One buffered update for everything that arrived since the last tick;
+            # completed lines are formatted right away
+            render_start = time.perf_counter()
+            self.chat_view.feed(text)
+            self.current_telemetry.ui_render_ms += (time.perf_counter() - render_start) * 1000.0
+
+        if end_of_stream:
+            self._finish_llm_response()
+
+        self.last_ui_tick_ms = (time.perf_counter() - tick_start) * 1000.0
 
         # Continue polling if not end of stream
-        if self.llm_process and self.llm_process.is_alive():
-            self.after(50, self.poll_llm_response_queue)
+        if self.active_request_id is not None:
+            if pending_tokens or not queue_drained:
+                self.poll_interval_ms = POLL_INTERVAL_STREAMING_MS
+            else:
+                self.poll_interval_ms = min(self.poll_interval_ms * 2, POLL_INTERVAL_IDLE_MAX_MS)
+            self._schedule_poll(self.poll_interval_ms)
+
+    def _finish_llm_response(self):
+        """Completes the response; only the last line still needs Markdown formatting."""
+        self.status_label.configure(text="") 
+        self.stop_button.configure(state="disabled")
+
+        render_start = time.perf_counter()
+        self.chat_view.end_stream(self.current_llm_full_response)
+        self.current_telemetry.ui_render_ms += (time.perf_counter() - render_start) * 1000.0
+        self.current_telemetry.finish()
+        self._store_message("BOT Octopus", self.current_llm_full_response, "black", markdown=True)
+
+        # Per-request telemetry: status bar and local metrics log
+        if self.current_generation_info:
+            metrics = build_metrics(self.current_telemetry, self.current_generation_info)
+            metrics["connections"] = get_transport().stats() # Keep-alive reuse of the Ollama connection pool
+            self.metrics_label.configure(text=format_metrics(metrics))
+            self.metrics_log.append(metrics)
+
+        # Failed requests carry no generation info and are not part of the conversation
+        if self.memory_enabled.get() and self.current_generation_info:
+            self.conversation.record(self.current_user_text, self.current_llm_full_response, self.current_generation_info)
+
+        # Documents the answer was based on
+        if self.current_generation_info and self.current_generation_info.get("sources"):
+            names = ", ".join(os.path.basename(path) for path in self.current_generation_info["sources"])
+            self.chat_view.add_message(None, f"Sources: {names}", "blue")
+        elif self.current_generation_info and self.current_generation_info.get("retrieval_error"):
+            self.chat_view.add_message(
+                None, f"Answered without documents: {self.current_generation_info['retrieval_error']}", "red"
+            )
+
+        if self.current_generation_info and self.current_generation_info.get("cached"):
+            stats = self.response_cache.stats()
+            self.status_label.configure(
+                text=f"Answered from cache (hits: {stats['hits']}, misses: {stats['misses']})",
+                text_color="gray"
+            )
+
+        self.active_request_id = None
+        self._release_model()
+        self._start_next_prompt()
 
     def display_message(self, sender, message, color_tag):
         """
         Displays a message in the chat history.
-        This function is now primarily used for "You" and "System" messages.
+        This function is now primarily used for "System" messages.
         LLM messages are handled by send_message and poll_llm_response_queue for streaming.
         """
-        self.chat_history.configure(state='normal') 
         if sender != "LLM":
-            self.chat_history.insert(tk.END, f"{sender}: ", color_tag)
-            self.chat_history.insert(tk.END, message, color_tag) 
-            self.chat_history.insert(tk.END, "\n\n") 
-        
-        self.chat_history.see(tk.END) 
-        self.chat_history.configure(state='disabled') 
-
-    def _insert_markdown_text(self, text_widget, markdown_text, default_tag):
-        """
-        Parses a simplified Markdown string and inserts it into the text_widget
-        with appropriate Tkinter tags.
-        Supports: #, ##, ### for headers, **, * for bold/italic, - for list items.
-        """
-        lines = markdown_text.split('\n')
-        for line in lines:
-            line = line.strip() 
-
-            # Handle block-level elements first
-            if line.startswith('### '):
-                text_widget.insert(tk.END, line[4:].strip() + '\n', ("h3", default_tag))
-            elif line.startswith('## '):
-                text_widget.insert(tk.END, line[3:].strip() + '\n', ("h2", default_tag))
-            elif line.startswith('# '):
-                text_widget.insert(tk.END, line[2:].strip() + '\n', ("h1", default_tag))
-            elif line.startswith('* ') or line.startswith('- '):
-                text_widget.insert(tk.END, "  " + line[2:].strip() + '\n', ("list_item", default_tag))
-            else:
-                # Handle inline formatting (bold/italic) for regular lines
-                # Regex to split on bold (**) and italic (*) markers, keeping the markers
-                parts = re.split(r'(\*\*.*?\*\*|\*.*?\*)', line)
-                for part in parts:
-                    if part.startswith('**') and part.endswith('**'):
-                        text_widget.insert(tk.END, part[2:-2], ("bold", default_tag))
-                    elif part.startswith('**') and part.endswith('**:'):
-                        text_widget.insert(tk.END, part[2:-2], ("bold", default_tag ))                  
-                    elif part.startswith('*') and part.endswith('*'):
-                        text_widget.insert(tk.END, part[1:-1], ("italic", default_tag))
-                    elif part.startswith('*') and part.endswith('*:'):
-                        text_widget.insert(tk.END, part[1:-1], ("italic", default_tag))
-                    else:
-                        text_widget.insert(tk.END, part, default_tag)
-                text_widget.insert(tk.END, '\n')
+            self.chat_view.add_message(sender, message, color_tag)
 
 if __name__ == "__main__":
     multiprocessing.freeze_support()
@@ -0,0 +1,166 @@
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_MODELS = ["fake-model:latest"]
+MARKDOWN_WORDS = ["Some", "**bold**", "and", "*italic*", "text", "with", "`code`", "in", "it."]
+
+
+class FakeOllamaConfig:
+    """How the fake server answers; shared by all request handlers."""
+
+    def __init__(self, tokens=500, rate=0.0, token_chars=4, models=None, first_token_delay=0.0, markdown=True):
+        self.tokens = tokens # Tokens per generation
+        self.rate = rate # Tokens per second, 0 streams as fast as possible
+        self.token_chars = token_chars
+        self.models = models or DEFAULT_MODELS
+        self.first_token_delay = first_token_delay # Simulated model load/prompt evaluation
+        self.markdown = markdown # Emit Markdown lines instead of plain filler text
+        self.generations = 0
+        self.loaded = [] # Resident models, in load order, as reported by /api/ps
+
+
+def make_token(config, index):
+    """Returns the text of token number index."""
+    if config.markdown:
+        if index % 40 == 0:
+            return "\n## Section\n" if index % 200 == 0 else "\n- "
+        word = MARKDOWN_WORDS[index % len(MARKDOWN_WORDS)]
+        return word + " "
+    return ("x" * (config.token_chars - 1)) + " "
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    """Implements the parts of the Ollama API the application uses."""
+
+    protocol_version = "HTTP/1.1"
+    config = None # Set by make_server
+
+    def log_message(self, format, *args):
+        pass # Keep benchmark output clean
+
+    def _send_json(self, payload, status=200):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({"models": [
+                {"name": name, "model": name, "digest": "0" * 64, "size": 1000000}
+                for name in self.config.models
+            ]})
+        elif self.path == "/api/ps":
+            self._send_json({"models": [
+                {"name": name, "model": name, "size": 1000000, "size_vram": 0, "expires_at": "0001-01-01T00:00:00Z"}
+                for name in list(self.config.loaded)
+            ]})
+        elif self.path in ("/", "/api/version"):
+            self._send_json({"version": "0.0.0-fake"})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if self.path == "/api/generate":
+            self._generate(body)
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def _generate(self, body):
+        config = self.config
+        config.generations += 1
+        model = body.get("model", config.models[0])
+        started = time.perf_counter()
+
+        if body.get("keep_alive") == 0:
+            if model in config.loaded:
+                config.loaded.remove(model)
+            self._send_json({"model": model, "response": "", "done": True, "done_reason": "unload"})
+            return
+        if model not in config.loaded:
+            config.loaded.append(model)
+
+        if not body.get("prompt"):
+            # Preload request (empty prompt), answered without generating
+            self._send_json({"model": model, "response": "", "done": True, "done_reason": "load"})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        if config.first_token_delay:
+            time.sleep(config.first_token_delay)
+        first_token_time = time.perf_counter()
+        interval = 1.0 / config.rate if config.rate else 0.0
+        try:
+            for index in range(config.tokens):
+                if interval:
+                    # Pace against the start time so sleep overhead does not add up
+                    delay = first_token_time + index * interval - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                self._write_chunk({"model": model, "response": make_token(config, index), "done": False})
+
+            finished = time.perf_counter()
+            self._write_chunk({
+                "model": model,
+                "response": "",
+                "done": True,
+                "done_reason": "stop",
+                "context": list(range(config.tokens + 10)),
+                "total_duration": int((finished - started) * 1e9),
+                "load_duration": 0,
+                "prompt_eval_count": 10,
+                "prompt_eval_duration": int((first_token_time - started) * 1e9),
+                "eval_count": config.tokens,
+                "eval_duration": int((finished - first_token_time) * 1e9),
+            })
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass # Client cancelled the stream
+
+    def _write_chunk(self, payload):
+        data = json.dumps(payload).encode("utf-8") + b"\n"
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+def make_server(config, host="127.0.0.1", port=11434):
+    """Creates (but does not start) a fake Ollama server."""
+    handler = type("ConfiguredFakeOllamaHandler", (FakeOllamaHandler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_background(config, host="127.0.0.1", port=11434):
+    """Starts a fake Ollama server in a daemon thread and returns it."""
+    server = make_server(config, host, port)
+    threading.Thread(target=server.serve_forever, name="FakeOllama", daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stand-in Ollama server for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--tokens", type=int, default=500, help="Tokens per generation")
+    parser.add_argument("--rate", type=float, default=0.0, help="Tokens per second (0 = unthrottled)")
+    parser.add_argument("--token-chars", type=int, default=4, help="Characters per plain token")
+    parser.add_argument("--first-token-delay", type=float, default=0.0, help="Seconds before the first token")
+    parser.add_argument("--plain", action="store_true", help="Plain filler text instead of Markdown")
+    args = parser.parse_args()
+
+    config = FakeOllamaConfig(args.tokens, args.rate, args.token_chars,
+                              first_token_delay=args.first_token_delay, markdown=not args.plain)
+    print(f"Fake Ollama listening on http://{args.host}:{args.port}")
+    make_server(config, args.host, args.port).serve_forever()
@@ -0,0 +1,287 @@
+import argparse
+import json
+import os
+import platform
+import queue
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from benchmark.fake_ollama import FakeOllamaConfig, start_in_background
+
+FAKE_HOST = "127.0.0.1"
+FAKE_PORT = 11535 # Next to, not on, the real Ollama port
+PROMPT = "Benchmark prompt"
+
+
+def summarize(values):
+    """Median, p95, mean, min and max of a list of numbers."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "median": statistics.median(ordered),
+        "p95": ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))],
+        "mean": statistics.fmean(ordered),
+        "min": ordered[0],
+        "max": ordered[-1],
+    }
+
+
+def port_in_use(host, port):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        return sock.connect_ex((host, port)) == 0
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# --- Engine: InferenceWorker -> queue, no GUI ---
+
+def bench_engine(config, runs):
+    """Time to first token and tokens/s through the inference worker and its queue."""
+    from utility.llmworker import InferenceWorker
+
+    response_queue = queue.Queue()
+    worker = InferenceWorker(response_queue)
+    worker.start()
+
+    ttft_ms, tokens_per_s, total_ms = [], [], []
+    try:
+        for _ in range(runs):
+            started = time.perf_counter()
+            request_id = worker.submit(PROMPT, config.models[0], 0.7)
+            first_token = None
+            tokens = 0
+            while True:
+                item_id, token = response_queue.get()
+                if item_id != request_id or isinstance(token, dict):
+                    continue
+                if token == "[END_OF_STREAM]":
+                    break
+                if first_token is None:
+                    first_token = time.perf_counter()
+                tokens += 1
+            finished = time.perf_counter()
+            ttft_ms.append((first_token - started) * 1000.0)
+            total_ms.append((finished - started) * 1000.0)
+            if finished > first_token:
+                tokens_per_s.append(tokens / (finished - first_token))
+    finally:
+        worker.shutdown()
+
+    return {
+        "time_to_first_token_ms": summarize(ttft_ms),
+        "tokens_per_second": summarize(tokens_per_s),
+        "total_ms": summarize(total_ms),
+    }
+
+
+# --- GUI: run_llm_inference -> queue -> poll_llm_response_queue ---
+
+def run_prompt(app, prompt):
+    """Sends a prompt through the GUI and pumps Tk until the answer is rendered."""
+    timings = {"first_feed": None, "finish_ms": None}
+    feed = app.chat_view.feed
+    finish = app._finish_llm_response
+
+    def timed_feed(text):
+        if timings["first_feed"] is None:
+            timings["first_feed"] = time.perf_counter()
+        feed(text)
+
+    def timed_finish():
+        started = time.perf_counter()
+        finish()
+        timings["finish_ms"] = (time.perf_counter() - started) * 1000.0
+
+    app.chat_view.feed = timed_feed
+    app._finish_llm_response = timed_finish
+    try:
+        app.user_input.delete("0.0", "end")
+        app.user_input.insert("0.0", prompt)
+        started = time.perf_counter()
+        app.send_message()
+        while app.active_request_id is not None:
+            app.update()
+            time.sleep(0.001)
+        finished = time.perf_counter()
+    finally:
+        app.chat_view.feed = feed
+        app._finish_llm_response = finish
+    return started, timings["first_feed"] or finished, finished, timings["finish_ms"]
+
+
+def wait_for_models(app, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while app.models_ready_time_ms is None and time.monotonic() < deadline:
+        app.update()
+        time.sleep(0.005)
+
+
+def bench_gui(config, runs, session_messages):
+    """Streaming through the Tk poller, final render time and memory over a long session."""
+    import app as chat_app
+
+    application = chat_app.LLMChatApp(auto_start_ollama=False)
+    application.cache_enabled.set(False) # Measure real streaming, not cache replays
+    application.memory_enabled.set(False)
+    wait_for_models(application)
+
+    ttft_ms, tokens_per_s, finish_ms, ui_tick_ms = [], [], [], []
+    for _ in range(runs):
+        started, first_feed, finished, finish_time = run_prompt(application, PROMPT)
+        ttft_ms.append((first_feed - started) * 1000.0)
+        if finished > first_feed:
+            tokens_per_s.append(config.tokens / (finished - first_feed))
+        if finish_time is not None:
+            finish_ms.append(finish_time)
+        ui_tick_ms.append(application.last_ui_tick_ms)
+
+    # Memory growth over a long session
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    samples = []
+    for index in range(1, session_messages + 1):
+        run_prompt(application, f"{PROMPT} {index}")
+        if index % 10 == 0 or index == session_messages:
+            current = tracemalloc.get_traced_memory()[0]
+            widget_lines = int(application.chat_history.index("end-1c").split(".")[0])
+            samples.append({"messages": index, "python_bytes": current - baseline, "widget_lines": widget_lines})
+    tracemalloc.stop()
+    application.on_closing()
+
+    growth = None
+    if len(samples) >= 2:
+        first, last = samples[0], samples[-1]
+        growth = (last["python_bytes"] - first["python_bytes"]) / (last["messages"] - first["messages"])
+
+    return {
+        "time_to_first_token_ms": summarize(ttft_ms),
+        "tokens_per_second": summarize(tokens_per_s),
+        "final_render_ms": summarize(finish_ms),
+        "last_ui_tick_ms": summarize(ui_tick_ms),
+        "memory": {"samples": samples, "bytes_per_message": growth},
+    }
+
+
+def bench_startup(runs):
+    """Launch to window ready and to model list, each in a fresh interpreter."""
+    window_ms, models_ms = [], []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--startup-child"],
+            capture_output=True, text=True, cwd=ROOT_DIR, timeout=60
+        )
+        if output.returncode != 0:
+            return {"error": output.stderr.strip().splitlines()[-1] if output.stderr.strip() else "startup failed"}
+        measured = json.loads(output.stdout.strip().splitlines()[-1])
+        window_ms.append(measured["startup_time_ms"])
+        if measured["models_ready_time_ms"] is not None:
+            models_ms.append(measured["models_ready_time_ms"])
+    return {"window_ready_ms": summarize(window_ms), "models_ready_ms": summarize(models_ms)}
+
+
+def startup_child():
+    """Runs inside the subprocess started by bench_startup."""
+    import app as chat_app # APP_START_TIME is taken on import
+
+    application = chat_app.LLMChatApp(auto_start_ollama=False)
+    wait_for_models(application)
+    while application.startup_time_ms is None:
+        application.update()
+    print(json.dumps({
+        "startup_time_ms": application.startup_time_ms,
+        "models_ready_time_ms": application.models_ready_time_ms,
+    }))
+    application.on_closing()
+
+
+def gui_available():
+    try:
+        import tkinter
+        root = tkinter.Tk()
+        root.destroy()
+        return True
+    except Exception:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures the chatbox's own overhead against a fake Ollama server")
+    parser.add_argument("--tokens", type=int, default=500, help="Tokens per generation")
+    parser.add_argument("--rate", type=float, default=0.0, help="Tokens per second of the fake server (0 = unthrottled)")
+    parser.add_argument("--first-token-delay", type=float, default=0.0, help="Simulated model latency in seconds")
+    parser.add_argument("--runs", type=int, default=10, help="Generations per streaming measurement")
+    parser.add_argument("--startup-runs", type=int, default=5)
+    parser.add_argument("--session-messages", type=int, default=200, help="Messages for the memory growth measurement")
+    parser.add_argument("--skip-gui", action="store_true", help="Only run the benchmarks that need no display")
+    parser.add_argument("--port", type=int, default=FAKE_PORT, help="Port of the fake Ollama server")
+    parser.add_argument("--output", default=os.path.join(ROOT_DIR, "benchmark", "results.json"))
+    parser.add_argument("--startup-child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.startup_child:
+        startup_child()
+        return
+
+    if port_in_use(FAKE_HOST, args.port):
+        sys.exit(f"Port {args.port} is in use, pick another one with --port.")
+
+    # Point this process and the startup subprocesses at the fake server, and
+    # keep their chat history, metrics and caches out of the user's data directory
+    os.environ["OLLAMA_HOST"] = f"{FAKE_HOST}:{args.port}"
+    data_dir = tempfile.mkdtemp(prefix="octopus_benchmark_")
+    os.environ["OCTOPUS_DATA_DIR"] = data_dir
+
+    config = FakeOllamaConfig(args.tokens, args.rate, first_token_delay=args.first_token_delay)
+    server = start_in_background(config, FAKE_HOST, args.port)
+
+    results = {"engine": bench_engine(config, args.runs)}
+    if args.skip_gui or not gui_available():
+        results["gui"] = {"skipped": "no display available" if not args.skip_gui else "--skip-gui"}
+    else:
+        results["startup"] = bench_startup(args.startup_runs)
+        results["gui"] = bench_gui(config, args.runs, args.session_messages)
+    from utility.transport import get_transport
+    results["connections"] = get_transport().stats()
+    server.shutdown()
+    shutil.rmtree(data_dir, ignore_errors=True)
+
+    report = {
+        "benchmark": "octopus-chatbox",
+        "format_version": 1,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "tokens": args.tokens,
+            "rate": args.rate,
+            "first_token_delay": args.first_token_delay,
+            "runs": args.runs,
+            "session_messages": args.session_messages,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report["results"], indent=2))
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+
+from utility.conversation import Conversation
+from utility.getmodels import get_local_llm_models
+from utility.runllm import run_llm_inference
+from utility.transport import configure_transport, get_transport
+
+
+def resolve_model(model):
+    """Returns the requested model, or the first installed one."""
+    if model:
+        return model
+    running, models = get_local_llm_models()
+    if not running:
+        sys.exit("Error: Could not connect to Ollama server. Is it running?")
+    if not models:
+        sys.exit("Error: No local models found. Pull a model with 'ollama pull <model>'.")
+    return models[0]
+
+
+def stream_to_stdout(transport, prompt, model, temperature, context=None, num_ctx=None):
+    """Streams one answer to stdout and returns (response_text, generation_info)."""
+    response_queue = queue.Queue()
+    cancel_event = threading.Event()
+    generation = threading.Thread(
+        target=run_llm_inference,
+        args=(prompt, model, temperature, response_queue),
+        kwargs=dict(transport=transport, cancel_event=cancel_event, context=context, num_ctx=num_ctx),
+        daemon=True
+    )
+    generation.start()
+
+    parts = []
+    info = None
+    try:
+        while True:
+            token = response_queue.get()
+            if token == "[END_OF_STREAM]":
+                break
+            if isinstance(token, dict):
+                info = token
+                continue
+            parts.append(token)
+            sys.stdout.write(token)
+            sys.stdout.flush()
+    except KeyboardInterrupt:
+        cancel_event.set() # Closes the stream, Ollama stops generating
+        sys.stdout.write("\n[stopped]")
+    sys.stdout.write("\n")
+    return "".join(parts), info
+
+
+def command_models(args):
+    running, models = get_local_llm_models()
+    if not running:
+        sys.exit("Error: Could not connect to Ollama server. Is it running?")
+    for model in models:
+        print(model)
+
+
+def command_chat(args):
+    transport = get_transport()
+    model = resolve_model(args.model)
+
+    if args.prompt:
+        stream_to_stdout(transport, " ".join(args.prompt), model, args.temperature)
+        return
+
+    # Interactive multi-turn chat, one prompt per line
+    conversation = Conversation()
+    print(f"Chatting with {model}. Empty line or Ctrl+D to quit.", file=sys.stderr)
+    while True:
+        try:
+            user_text = input("You: ").strip()
+        except EOFError:
+            break
+        if not user_text:
+            break
+        prompt, context = conversation.prepare(model, user_text)
+        response, info = stream_to_stdout(transport, prompt, model, args.temperature, context, conversation.num_ctx)
+        if info is not None: # Failed requests are not part of the conversation
+            conversation.record(user_text, response, info)
+
+
+def command_batch(args):
+    from utility.batchrunner import BatchRunner
+    model = resolve_model(args.model)
+    output_path = args.output or os.path.splitext(args.input)[0] + ".results.jsonl"
+    runner = BatchRunner(model, args.temperature, workers=args.workers, seed=args.seed, transport=get_transport())
+
+    def report(result):
+        if result["status"] == "ok":
+            print(f"{result['id']}: ok, {result['total_ms']:.0f} ms, {result['eval_count']} tokens", file=sys.stderr)
+        else:
+            print(f"{result['id']}: {result['status']} {result['error'] or ''}", file=sys.stderr)
+
+    print(f"Running {args.input} on {model} with {runner.workers} worker(s), results in {output_path}", file=sys.stderr)
+    try:
+        runner.run(args.input, output_path, on_result=report)
+    except KeyboardInterrupt:
+        print("Interrupted; run the same command again to resume.", file=sys.stderr)
+    summary = runner.summary()
+    print(json.dumps(summary, indent=2))
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+
+class _StdoutStream:
+    """Queue stand-in that prints a map-reduce answer: progress to stderr, tokens to stdout."""
+
+    def __init__(self):
+        self.info = None
+
+    def put(self, token):
+        if isinstance(token, dict) and "progress" in token:
+            print(token["progress"], file=sys.stderr)
+        elif isinstance(token, dict):
+            self.info = token
+        elif token == "[END_OF_STREAM]":
+            print()
+        else:
+            sys.stdout.write(token)
+            sys.stdout.flush()
+
+
+def command_summarize(args):
+    from utility.mapreduce import DEFAULT_INSTRUCTION, run_map_reduce
+    model = resolve_model(args.model)
+    with open(args.input, "r", encoding="utf-8", errors="replace") as f:
+        document = f.read()
+    stream = _StdoutStream()
+    # A blank line separates the task from the document, as when it is pasted into the chat
+    run_map_reduce(f"{args.instruction or DEFAULT_INSTRUCTION}\n\n{document}", model, args.temperature, stream,
+                   transport=get_transport(), parallel=args.parallel)
+    if stream.info:
+        print(
+            f"{stream.info['parts']} parts in {stream.info['map_ms'] / 1000.0:.1f} s with {stream.info['parallel']} "
+            f"at a time (one by one {stream.info['map_sequential_ms'] / 1000.0:.1f} s)",
+            file=sys.stderr
+        )
+
+
+def command_serve(args):
+    from utility.apiserver import ChatApiServer
+    server = ChatApiServer(get_transport(), host=args.host, port=args.port, max_concurrent=args.max_concurrent)
+    print(f"Serving the chatbox API on http://{args.host}:{args.port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Octopus | Local LLM Chatbox without a GUI")
+    parser.add_argument("--ollama-url", help="Ollama server URL (default: OLLAMA_HOST or http://localhost:11434)")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    models = subcommands.add_parser("models", help="List the installed Ollama models")
+    models.set_defaults(func=command_models)
+
+    chat = subcommands.add_parser("chat", help="Stream an answer to stdout (interactive when no prompt is given)")
+    chat.add_argument("prompt", nargs="*", help="Prompt text")
+    chat.add_argument("-m", "--model", help="Model name (default: first installed model)")
+    chat.add_argument("-t", "--temperature", type=float, default=0.7)
+    chat.set_defaults(func=command_chat)
+
+    batch = subcommands.add_parser("batch", help="Run a JSONL file of prompts, resumable, with latency statistics")
+    batch.add_argument("input", help="JSONL file, one {\"id\", \"prompt\"} object per line")
+    batch.add_argument("-o", "--output", help="Results JSONL (default: <input>.results.jsonl), appended to and resumed from")
+    batch.add_argument("-m", "--model", help="Model name (default: first installed model)")
+    batch.add_argument("-t", "--temperature", type=float, default=0.7)
+    batch.add_argument("--seed", type=int, help="Fixed seed for reproducible answers")
+    batch.add_argument("-w", "--workers", type=int, default=2, help="Prompts sent to Ollama at the same time")
+    batch.add_argument("--summary", help="Also write the summary JSON to this file")
+    batch.set_defaults(func=command_batch)
+
+    summarize = subcommands.add_parser("summarize", help="Summarize a text file of any length, in parallel parts")
+    summarize.add_argument("input", help="Text file")
+    summarize.add_argument("-i", "--instruction", help="Task for the text (default: summarize it)")
+    summarize.add_argument("-m", "--model", help="Model name (default: first installed model)")
+    summarize.add_argument("-t", "--temperature", type=float, default=0.7)
+    summarize.add_argument("-p", "--parallel", type=int,
+                           help="Parts processed at the same time (default: OLLAMA_NUM_PARALLEL or 4)")
+    summarize.set_defaults(func=command_summarize)
+
+    serve = subcommands.add_parser("serve", help="Run the local HTTP/SSE API")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--max-concurrent", type=int, default=4, help="Generations running at the same time")
+    serve.set_defaults(func=command_serve)
+    return parser
+
+
+if __name__ == "__main__":
+    arguments = build_parser().parse_args()
+    if arguments.ollama_url:
+        configure_transport(arguments.ollama_url)
+    arguments.func(arguments)
@@ -0,0 +1,242 @@
+import asyncio
+import json
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from utility.conversation import Conversation
+from utility.getmodels import get_local_llm_models
+from utility.runllm import run_llm_inference
+
+DEFAULT_MAX_CONCURRENT = 4 # Generations running against Ollama at the same time
+STREAM_BUFFER_ITEMS = 64 # Tokens buffered per client before the generation waits (backpressure)
+MAX_BODY_BYTES = 1024 * 1024
+
+
+class _AsyncQueueBridge:
+    """
+    Lets run_llm_inference, which runs in a worker thread, put items on an
+    asyncio.Queue. put() blocks while the queue is full, so a slow client
+    slows down its own generation instead of growing memory.
+    """
+
+    def __init__(self, loop, async_queue, cancel_event):
+        self.loop = loop
+        self.async_queue = async_queue
+        self.cancel_event = cancel_event
+
+    def put(self, item):
+        future = asyncio.run_coroutine_threadsafe(self.async_queue.put(item), self.loop)
+        try:
+            future.result()
+        except Exception:
+            self.cancel_event.set() # The event loop is gone, stop generating
+
+
+class _Session:
+    def __init__(self):
+        self.conversation = Conversation()
+        self.cancel_event = None # Set while a generation is running
+
+
+class ChatApiServer:
+    """
+    Local HTTP API over the same inference path as the GUI.
+    Every generation runs run_llm_inference in a bounded thread pool over the
+    shared Ollama transport (one connection pool) and streams to its client as
+    Server-Sent Events. Each session has its own conversation and can be
+    cancelled on its own; a client that disconnects cancels its generation.
+
+    Endpoints:
+        GET    /api/models                     installed models
+        GET    /api/stats                      connection reuse of the Ollama transport
+        POST   /api/generate                   one-off prompt, streamed
+        POST   /api/sessions                   new session -> {"session_id"}
+        POST   /api/sessions/<id>/messages     prompt in a session, streamed
+        POST   /api/sessions/<id>/cancel       stop the session's generation
+        DELETE /api/sessions/<id>              forget the session
+    Request bodies are JSON: {"prompt", "model", "temperature"}.
+    """
+
+    def __init__(self, transport, host="127.0.0.1", port=8765, max_concurrent=DEFAULT_MAX_CONCURRENT):
+        self.transport = transport
+        self.host = host
+        self.port = port
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="ApiGeneration")
+        self.sessions = {}
+
+    def serve_forever(self):
+        """Runs the server until interrupted."""
+        asyncio.run(self._serve())
+
+    async def _serve(self):
+        server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for session in self.sessions.values():
+                if session.cancel_event is not None:
+                    session.cancel_event.set()
+            self.executor.shutdown(wait=False)
+
+    # --- HTTP handling ---
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            method, path, body = await self._read_request(reader)
+            await self._route(method, path, body, writer)
+        except (ValueError, json.JSONDecodeError) as e:
+            await self._send_json(writer, 400, {"error": str(e)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        request_line = (await reader.readline()).decode("latin-1").strip()
+        parts = request_line.split()
+        if len(parts) != 3:
+            raise ValueError("Malformed request line")
+        method, path, _ = parts
+
+        content_length = 0
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "content-length":
+                content_length = int(value.strip())
+        if content_length > MAX_BODY_BYTES:
+            raise ValueError("Request body too large")
+
+        body = json.loads(await reader.readexactly(content_length)) if content_length else {}
+        if not isinstance(body, dict):
+            raise ValueError("Request body must be a JSON object")
+        return method, path.split("?")[0].rstrip("/"), body
+
+    async def _route(self, method, path, body, writer):
+        parts = path.strip("/").split("/")
+        if method == "GET" and path == "/api/models":
+            loop = asyncio.get_running_loop()
+            running, models = await loop.run_in_executor(None, get_local_llm_models)
+            await self._send_json(writer, 200 if running else 503, {"running": running, "models": models})
+        elif method == "GET" and path == "/api/stats":
+            await self._send_json(writer, 200, self.transport.stats())
+        elif method == "POST" and path == "/api/generate":
+            await self._stream_generation(writer, body, None)
+        elif method == "POST" and path == "/api/sessions":
+            session_id = uuid.uuid4().hex
+            self.sessions[session_id] = _Session()
+            await self._send_json(writer, 201, {"session_id": session_id})
+        elif len(parts) >= 3 and parts[:2] == ["api", "sessions"]:
+            session = self.sessions.get(parts[2])
+            if session is None:
+                await self._send_json(writer, 404, {"error": "Unknown session"})
+            elif method == "POST" and parts[3:] == ["messages"]:
+                await self._stream_generation(writer, body, session)
+            elif method == "POST" and parts[3:] == ["cancel"]:
+                if session.cancel_event is not None:
+                    session.cancel_event.set()
+                await self._send_json(writer, 200, {"cancelled": session.cancel_event is not None})
+            elif method == "DELETE" and not parts[3:]:
+                if session.cancel_event is not None:
+                    session.cancel_event.set()
+                del self.sessions[parts[2]]
+                await self._send_json(writer, 200, {"deleted": True})
+            else:
+                await self._send_json(writer, 404, {"error": "Not found"})
+        else:
+            await self._send_json(writer, 404, {"error": "Not found"})
+
+    async def _send_json(self, writer, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {_REASONS.get(status, 'OK')}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            "Connection: close\r\n\r\n".encode("latin-1") + data
+        )
+        await writer.drain()
+
+    # --- Streaming ---
+
+    async def _stream_generation(self, writer, body, session):
+        prompt = body.get("prompt")
+        model = body.get("model")
+        temperature = body.get("temperature", 0.7)
+        if not prompt or not model or not isinstance(prompt, str) or not isinstance(model, str):
+            await self._send_json(writer, 400, {"error": "'prompt' and 'model' are required strings"})
+            return
+        if isinstance(temperature, bool) or not isinstance(temperature, (int, float)):
+            await self._send_json(writer, 400, {"error": "'temperature' must be a number"})
+            return
+        if session is not None and session.cancel_event is not None:
+            await self._send_json(writer, 409, {"error": "A generation is already running in this session"})
+            return
+        temperature = float(temperature)
+
+        context = None
+        if session is not None:
+            prompt_to_send, context = session.conversation.prepare(model, prompt)
+        else:
+            prompt_to_send = prompt
+
+        loop = asyncio.get_running_loop()
+        tokens = asyncio.Queue(maxsize=STREAM_BUFFER_ITEMS)
+        cancel_event = threading.Event()
+        if session is not None:
+            session.cancel_event = cancel_event
+
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            b"Cache-Control: no-cache\r\n"
+            b"Connection: close\r\n\r\n"
+        )
+        generation = loop.run_in_executor(
+            self.executor,
+            lambda: run_llm_inference(
+                prompt_to_send, model, temperature, _AsyncQueueBridge(loop, tokens, cancel_event),
+                transport=self.transport,
+                cancel_event=cancel_event,
+                context=context,
+                num_ctx=session.conversation.num_ctx if session is not None else None
+            )
+        )
+
+        response_parts = []
+        info = None
+        try:
+            while True:
+                item = await tokens.get()
+                if item == "[END_OF_STREAM]":
+                    break
+                if isinstance(item, dict):
+                    info = item
+                    continue
+                response_parts.append(item)
+                writer.write(b"data: " + json.dumps({"token": item}).encode("utf-8") + b"\n\n")
+                await writer.drain() # Waits for slow clients; the bounded queue then pauses the generation
+            done = {key: value for key, value in (info or {}).items() if key != "context"}
+            done["cancelled"] = cancel_event.is_set()
+            writer.write(b"event: done\ndata: " + json.dumps(done).encode("utf-8") + b"\n\n")
+            await writer.drain()
+        except ConnectionError:
+            cancel_event.set() # Client went away
+        finally:
+            cancel_event.set()
+            # Let the generation thread finish putting its last items
+            while not generation.done():
+                try:
+                    tokens.get_nowait()
+                except asyncio.QueueEmpty:
+                    await asyncio.sleep(0.01)
+            if session is not None:
+                session.cancel_event = None
+                if info is not None:
+                    session.conversation.record(prompt, "".join(response_parts), info)
+
+
+_REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 409: "Conflict", 503: "Service Unavailable"}
@@ -0,0 +1,12 @@
+import os
+
+# Everything the application stores locally lives below this directory;
+# OCTOPUS_DATA_DIR points it elsewhere (the benchmark uses a throwaway one)
+APP_DATA_DIR = os.environ.get("OCTOPUS_DATA_DIR") or os.path.join(os.path.expanduser("~"), ".octopus_chatbox")
+
+
+def app_data_path(*parts):
+    """Returns a path inside the application data directory, creating its parent folder."""
+    path = os.path.join(APP_DATA_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
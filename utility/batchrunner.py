@@ -0,0 +1,238 @@
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utility.conversation import DEFAULT_NUM_CTX
+from utility.modelresidency import DEFAULT_KEEP_ALIVE
+from utility.runllm import run_llm_inference
+from utility.transport import get_transport
+
+DEFAULT_BATCH_WORKERS = 2 # Prompts sent to Ollama at the same time
+PERCENTILES = (50, 90, 95, 99)
+
+
+class _ResultCollector:
+    """Queue stand-in for run_llm_inference that keeps one answer and times it."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_token_at = None
+        self.parts = []
+        self.info = None
+
+    def put(self, token):
+        if isinstance(token, dict):
+            self.info = token
+        elif token != "[END_OF_STREAM]":
+            if self.first_token_at is None:
+                self.first_token_at = time.perf_counter()
+            self.parts.append(token)
+
+
+def percentile(ordered, percent):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    rank = math.ceil(percent / 100.0 * len(ordered)) - 1
+    return ordered[max(0, min(len(ordered) - 1, rank))]
+
+
+def read_completed_ids(output_path):
+    """Ids that already have a successful result in output_path (for resuming)."""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue # Half-written last line of an interrupted run
+            if record.get("status") == "ok":
+                completed.add(str(record.get("id")))
+    return completed
+
+
+def read_prompts(input_path):
+    """
+    Yields prompt records from a JSONL file. Each line is {"prompt": ...} or a
+    plain JSON string, optionally with "id", "model", "temperature" and
+    "seed". Lines without an id get their line number. A malformed line is
+    yielded as {"id": <line number>, "invalid": message}, so it is reported
+    in the results instead of stopping the run halfway.
+    """
+    with open(input_path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield {"id": str(number), "invalid": f"Line {number} is not valid JSON: {e}"}
+                continue
+            if isinstance(record, str):
+                record = {"prompt": record}
+            if not isinstance(record, dict):
+                yield {"id": str(number), "invalid": f"Line {number} is neither an object nor a string"}
+                continue
+            if not isinstance(record.get("prompt"), str):
+                record["invalid"] = "No prompt" if record.get("prompt") is None else "The prompt must be a string"
+            record.setdefault("id", number)
+            record["id"] = str(record["id"])
+            yield record
+
+
+class BatchRunner:
+    """
+    Runs a JSONL file of prompts through Ollama with a bounded worker pool.
+    Every result is appended to the output JSONL as soon as it is finished,
+    so an interrupted run loses only the prompts that were in flight; a
+    second run skips the ids that already succeeded. At the end summary()
+    gives throughput and latency percentiles.
+    """
+
+    def __init__(self, model, temperature, workers=DEFAULT_BATCH_WORKERS, seed=None, transport=None,
+                 num_ctx=DEFAULT_NUM_CTX, keep_alive=DEFAULT_KEEP_ALIVE):
+        self.model = model
+        self.temperature = temperature
+        self.workers = max(1, workers)
+        self.seed = seed
+        self.transport = transport
+        self.num_ctx = num_ctx
+        self.keep_alive = keep_alive
+        self.cancel_event = threading.Event()
+        self.results = [] # Records of this run, without the response text
+        self.skipped = 0
+        self.started = None
+        self.finished = None
+        self._write_lock = threading.Lock()
+
+    def run(self, input_path, output_path, on_result=None):
+        """Processes all prompts not completed yet; on_result(record) is called for each one."""
+        if self.transport is None:
+            self.transport = get_transport()
+        completed = read_completed_ids(output_path)
+        self.started = time.perf_counter()
+        # Bounded submission: at most two prompts per worker wait in memory
+        slots = threading.BoundedSemaphore(self.workers * 2)
+
+        # An interrupted run may have left half a line behind
+        needs_newline = False
+        if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+            with open(output_path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b"\n"
+
+        with open(output_path, "a", encoding="utf-8") as output, \
+                ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="BatchGeneration") as executor:
+            if needs_newline:
+                output.write("\n")
+            try:
+                for record in read_prompts(input_path):
+                    if record["id"] in completed:
+                        self.skipped += 1
+                        continue
+                    while not slots.acquire(timeout=0.2): # Timeout keeps Ctrl+C responsive
+                        if self.cancel_event.is_set():
+                            break
+                    if self.cancel_event.is_set():
+                        break
+
+                    def job(record=record):
+                        try:
+                            result = self._run_one(record)
+                            self._write(output, result)
+                            if on_result is not None:
+                                on_result(result)
+                        finally:
+                            slots.release()
+
+                    executor.submit(job)
+            except KeyboardInterrupt:
+                self.cancel() # Running streams are closed, the pool then finishes quickly
+                raise
+            finally:
+                executor.shutdown(wait=True)
+                self.finished = time.perf_counter()
+
+    def cancel(self):
+        """Stops submitting and closes the running streams; finished results are kept."""
+        self.cancel_event.set()
+
+    def _run_one(self, record):
+        collector = _ResultCollector()
+        model = record.get("model", self.model)
+        if record.get("invalid") or not record["prompt"]:
+            return {"id": record["id"], "model": model, "status": "error", "error": record.get("invalid") or "No prompt",
+                    "response": None, "ttft_ms": None, "total_ms": 0.0, "prompt_eval_count": None, "eval_count": 0, "tokens_per_second": None}
+        run_llm_inference(
+            record["prompt"], model, record.get("temperature", self.temperature), collector,
+            transport=self.transport,
+            cancel_event=self.cancel_event,
+            num_ctx=self.num_ctx,
+            seed=record.get("seed", self.seed),
+            keep_alive=self.keep_alive
+        )
+        finished = time.perf_counter()
+        response = "".join(collector.parts)
+        info = collector.info or {}
+        eval_count = info.get("eval_count") or 0
+        eval_ns = info.get("eval_duration") or 0
+
+        if collector.info is not None:
+            status, error = "ok", None
+        elif self.cancel_event.is_set():
+            status, error = "cancelled", None
+        else:
+            status, error = "error", response # run_llm_inference sends errors as text
+        return {
+            "id": record["id"],
+            "model": model,
+            "status": status,
+            "error": error,
+            "response": response if status == "ok" else None,
+            "ttft_ms": (collector.first_token_at - collector.started) * 1000.0 if collector.first_token_at else None,
+            "total_ms": (finished - collector.started) * 1000.0,
+            "prompt_eval_count": info.get("prompt_eval_count"),
+            "eval_count": eval_count,
+            "tokens_per_second": eval_count / (eval_ns / 1e9) if eval_ns else None,
+        }
+
+    def _write(self, output, result):
+        line = json.dumps(result) + "\n"
+        with self._write_lock:
+            output.write(line)
+            output.flush() # Results are on disk as soon as they are finished
+            self.results.append({key: value for key, value in result.items() if key != "response"})
+
+    def summary(self):
+        """Counts, throughput and latency percentiles of this run."""
+        ok = [result for result in self.results if result["status"] == "ok"]
+        wall_s = ((self.finished or time.perf_counter()) - self.started) if self.started else 0.0
+        tokens = sum(result["eval_count"] for result in ok)
+
+        def distribution(key):
+            values = sorted(result[key] for result in ok if result[key] is not None)
+            if not values:
+                return None
+            summary = {f"p{percent}": percentile(values, percent) for percent in PERCENTILES}
+            summary["mean"] = sum(values) / len(values)
+            return summary
+
+        return {
+            "completed": len(ok),
+            "failed": sum(1 for result in self.results if result["status"] == "error"),
+            "cancelled": sum(1 for result in self.results if result["status"] == "cancelled"),
+            "skipped": self.skipped,
+            "workers": self.workers,
+            "wall_s": wall_s,
+            "prompts_per_second": len(ok) / wall_s if wall_s else None,
+            "tokens_per_second": tokens / wall_s if wall_s else None,
+            "ttft_ms": distribution("ttft_ms"),
+            "total_ms": distribution("total_ms"),
+            "model_tokens_per_second": distribution("tokens_per_second"),
+        }
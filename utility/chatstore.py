@@ -0,0 +1,187 @@
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+SEARCH_RESULT_LIMIT = 50
+TITLE_MAX_CHARS = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    sender TEXT,
+    tag TEXT NOT NULL,
+    markdown INTEGER NOT NULL,
+    created REAL NOT NULL,
+    length INTEGER NOT NULL,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_by_session ON messages (session_id, position);
+CREATE INDEX IF NOT EXISTS sessions_by_update ON sessions (updated);
+"""
+
+
+class ChatStore:
+    """
+    Persistent conversation store in a local SQLite database.
+    Writes go through a queue to a background writer thread, so the UI never
+    waits for the disk. Reads are split so that listing sessions and opening
+    one only touch metadata; message bodies are fetched on demand. Message
+    text is indexed with FTS5 for full-text search when SQLite supports it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._writes = queue.Queue()
+
+        connection = sqlite3.connect(path)
+        connection.execute("PRAGMA journal_mode=WAL") # Readers do not wait for the writer
+        connection.executescript(SCHEMA)
+        try:
+            connection.execute("CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5("
+                               "body, session_id UNINDEXED, message_id UNINDEXED)")
+            self.full_text_index = True
+        except sqlite3.OperationalError:
+            self.full_text_index = False # SQLite without FTS5, search falls back to LIKE
+        connection.commit()
+        connection.close()
+
+        # The UI thread reads through its own connection
+        self._reader = sqlite3.connect(path, check_same_thread=False)
+        self._reader_lock = threading.Lock()
+
+        self._writer = threading.Thread(target=self._write_loop, name="ChatStoreWriter", daemon=True)
+        self._writer.start()
+
+    # --- Writes (asynchronous) ---
+
+    def new_session(self, title):
+        """Creates a session and returns its id right away; the row is written in the background."""
+        session_id = uuid.uuid4().hex
+        self._writes.put(("session", (session_id, title[:TITLE_MAX_CHARS], time.time())))
+        return session_id
+
+    def add_message(self, session_id, sender, text, tag, markdown=False):
+        """Queues a message for writing."""
+        self._writes.put(("message", (session_id, sender, text, tag, markdown, time.time())))
+
+    def close(self, timeout=5):
+        """Writes everything still queued and stops the writer thread."""
+        self._writes.put(None)
+        self._writer.join(timeout)
+        with self._reader_lock:
+            self._reader.close()
+
+    def _write_loop(self):
+        connection = sqlite3.connect(self.path)
+        while True:
+            item = self._writes.get()
+            if item is None:
+                break
+            kind, args = item
+            try:
+                if kind == "session":
+                    connection.execute(
+                        "INSERT INTO sessions (id, title, created, updated) VALUES (?, ?, ?, ?)",
+                        (args[0], args[1], args[2], args[2])
+                    )
+                else:
+                    self._insert_message(connection, *args)
+                # Commit once the queue is empty, so bursts share one transaction
+                if self._writes.empty():
+                    connection.commit()
+            except sqlite3.Error:
+                connection.rollback()
+        connection.commit()
+        connection.close()
+
+    def _insert_message(self, connection, session_id, sender, text, tag, markdown, created):
+        row = connection.execute("SELECT message_count FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        position = row[0] if row else 0
+        cursor = connection.execute(
+            "INSERT INTO messages (session_id, position, sender, tag, markdown, created, length, body) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (session_id, position, sender, tag, int(markdown), created, len(text), text)
+        )
+        connection.execute(
+            "UPDATE sessions SET message_count = message_count + 1, updated = ? WHERE id = ?",
+            (created, session_id)
+        )
+        if self.full_text_index:
+            connection.execute(
+                "INSERT INTO messages_fts (body, session_id, message_id) VALUES (?, ?, ?)",
+                (text, session_id, cursor.lastrowid)
+            )
+
+    # --- Reads ---
+
+    def _read(self, sql, params=()):
+        with self._reader_lock:
+            return self._reader.execute(sql, params).fetchall()
+
+    def list_sessions(self, limit=200):
+        """Returns session metadata, most recently updated first."""
+        rows = self._read(
+            "SELECT id, title, updated, message_count FROM sessions ORDER BY updated DESC LIMIT ?",
+            (limit,)
+        )
+        return [{"id": r[0], "title": r[1], "updated": r[2], "message_count": r[3]} for r in rows]
+
+    def load_message_headers(self, session_id):
+        """Returns the messages of a session without their bodies (text is None)."""
+        rows = self._read(
+            "SELECT id, sender, tag, markdown, length FROM messages WHERE session_id = ? ORDER BY position",
+            (session_id,)
+        )
+        return [
+            {"message_id": r[0], "sender": r[1], "tag": r[2], "markdown": bool(r[3]), "length": r[4], "text": None}
+            for r in rows
+        ]
+
+    def load_bodies(self, message_ids):
+        """Returns {message_id: body} for the given messages."""
+        if not message_ids:
+            return {}
+        placeholders = ",".join("?" * len(message_ids))
+        rows = self._read(f"SELECT id, body FROM messages WHERE id IN ({placeholders})", tuple(message_ids))
+        return dict(rows)
+
+    def search(self, query, limit=SEARCH_RESULT_LIMIT):
+        """Full-text search over all messages; returns matching sessions with a snippet."""
+        terms = query.split()
+        if not terms:
+            return []
+        if self.full_text_index:
+            match = " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+            rows = self._read(
+                "SELECT f.session_id, s.title, s.updated, snippet(messages_fts, 0, '', '', '...', 12) "
+                "FROM messages_fts f JOIN sessions s ON s.id = f.session_id "
+                "WHERE messages_fts MATCH ? ORDER BY rank LIMIT ?",
+                (match, limit)
+            )
+        else:
+            rows = self._read(
+                "SELECT m.session_id, s.title, s.updated, substr(m.body, 1, 80) "
+                "FROM messages m JOIN sessions s ON s.id = m.session_id "
+                "WHERE m.body LIKE ? ORDER BY m.created DESC LIMIT ?",
+                ("%" + query + "%", limit)
+            )
+
+        # One result per session, best match first
+        results = []
+        seen = set()
+        for session_id, title, updated, snippet in rows:
+            if session_id not in seen:
+                seen.add(session_id)
+                results.append({"id": session_id, "title": title, "updated": updated, "snippet": snippet})
+        return results
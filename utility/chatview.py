@@ -0,0 +1,206 @@
+import tkinter as tk
+
+from utility.streammarkdown import StreamingMarkdownRenderer
+
+MAX_MATERIALIZED_MESSAGES = 60 # Messages kept as Tk text while following the newest message
+LOAD_OLDER_BATCH = 20 # Older messages rendered at once when scrolling to the top
+PREPEND_MARK = "chat_prepend_point"
+
+
+class ChatView:
+    """
+    Windowed chat history on top of a ScrolledText widget.
+    Every message is kept as a compact record (sender, text, tag, markdown),
+    but only the newest messages are rendered as Tk text. Older ones are
+    dropped from the widget as new messages arrive and rendered again in
+    batches when the user scrolls to the top, so the widget, and with it the
+    cost of every insert and see(), stays bounded however long the session is.
+    Records loaded from the chat store carry a message_id and may have no
+    text yet; body_loader fetches their bodies when they are rendered.
+    """
+
+    def __init__(self, text_widget, max_materialized=MAX_MATERIALIZED_MESSAGES, body_loader=None):
+        self.text_widget = text_widget
+        self.max_materialized = max_materialized
+        self.body_loader = body_loader # Callable [message_id] -> {message_id: text}
+        self.records = [] # {"sender", "text", "tag", "markdown"} per message
+        self.first_materialized = 0 # Index of the oldest record shown in the widget
+        self.stream_record = None # Record of the message that is streaming right now
+        self.stream_renderer = None
+        self.deferred_records = [] # Messages that arrived while a stream was running
+        self._load_pending = False
+
+        # Hook into scrolling to render older messages on demand
+        self._scrollbar_set = text_widget.vbar.set if hasattr(text_widget, "vbar") else None
+        text_widget.configure(yscrollcommand=self._on_yscroll)
+
+    def add_message(self, sender, text, tag, markdown=False):
+        """
+        Appends a complete message (sender may be None for a plain notice).
+        While a message is streaming it is shown after that message ends.
+        """
+        record = {"sender": sender, "text": text, "tag": tag, "markdown": markdown}
+        if self.stream_record is not None:
+            self.deferred_records.append(record)
+            return
+        follow = self._at_bottom()
+        self.text_widget.configure(state='normal')
+        self._append_record(record)
+        self.text_widget.configure(state='disabled')
+        self._after_append(follow)
+
+    def begin_stream(self, sender, tag):
+        """Starts a streamed Markdown message; feed() adds text to it."""
+        record = {"sender": sender, "text": "", "tag": tag, "markdown": True}
+        follow = self._at_bottom()
+        self.text_widget.configure(state='normal')
+        self._start_record(record)
+        self.text_widget.insert(tk.END, f"{sender}: ", tag)
+        self.stream_renderer = StreamingMarkdownRenderer(self.text_widget, tag)
+        self.stream_renderer.begin()
+        self.text_widget.configure(state='disabled')
+        self.stream_record = record
+        self._after_append(follow)
+
+    def feed(self, text):
+        """Adds streamed text to the current message."""
+        follow = self._at_bottom()
+        self.text_widget.configure(state='normal')
+        self.stream_renderer.feed(text)
+        self.text_widget.configure(state='disabled')
+        if follow:
+            self.text_widget.see(tk.END)
+
+    def end_stream(self, full_text):
+        """Completes the streamed message and stores its full text in the record."""
+        if self.stream_record is None:
+            return
+        follow = self._at_bottom()
+        self.text_widget.configure(state='normal')
+        self.stream_renderer.finish()
+        self.text_widget.insert(tk.END, "\n\n")
+        self.stream_record["text"] = full_text
+        self.stream_record = None
+        self.stream_renderer = None
+        for record in self.deferred_records:
+            self._append_record(record)
+        self.deferred_records = []
+        self.text_widget.configure(state='disabled')
+        self._after_append(follow)
+
+    def clear(self):
+        """Removes all messages."""
+        self.text_widget.configure(state='normal')
+        self.text_widget.delete("1.0", tk.END)
+        for index in range(self.first_materialized, len(self.records)):
+            self.text_widget.mark_unset(self._mark(index))
+        self.text_widget.configure(state='disabled')
+        self.records = []
+        self.first_materialized = 0
+        self.stream_record = None
+        self.stream_renderer = None
+        self.deferred_records = []
+
+    def load_records(self, records):
+        """Replaces the history with stored records, rendering only the newest ones."""
+        self.clear()
+        self.records = list(records)
+        self.first_materialized = max(0, len(self.records) - self.max_materialized)
+        self._fetch_bodies(self.first_materialized, len(self.records))
+
+        self.text_widget.configure(state='normal')
+        for index in range(self.first_materialized, len(self.records)):
+            mark = self._mark(index)
+            self.text_widget.mark_set(mark, "end-1c")
+            self.text_widget.mark_gravity(mark, tk.LEFT)
+            self._render(self.records[index], tk.END)
+        self.text_widget.configure(state='disabled')
+        self.text_widget.see(tk.END)
+
+    def _fetch_bodies(self, start, end):
+        """Loads the missing bodies of records[start:end] in one call."""
+        missing = [record for record in self.records[start:end] if record["text"] is None]
+        if not missing:
+            return
+        bodies = self.body_loader([record["message_id"] for record in missing]) if self.body_loader else {}
+        for record in missing:
+            record["text"] = bodies.get(record["message_id"], "")
+
+    def _mark(self, index):
+        return f"chat_msg_{index}"
+
+    def _start_record(self, record):
+        """Adds a record and marks where its text starts in the widget."""
+        self.records.append(record)
+        mark = self._mark(len(self.records) - 1)
+        self.text_widget.mark_set(mark, "end-1c")
+        self.text_widget.mark_gravity(mark, tk.LEFT)
+
+    def _append_record(self, record):
+        self._start_record(record)
+        self._render(record, tk.END)
+
+    def _render(self, record, index):
+        """Renders a complete record at index."""
+        if record["sender"]:
+            self.text_widget.insert(index, f"{record['sender']}: ", record["tag"])
+        if record["markdown"]:
+            StreamingMarkdownRenderer(self.text_widget, record["tag"]).render(record["text"], index)
+        else:
+            self.text_widget.insert(index, record["text"], record["tag"])
+        self.text_widget.insert(index, "\n\n")
+
+    def _after_append(self, follow):
+        """Drops the oldest rendered messages while the user follows the newest one."""
+        if follow:
+            self._trim()
+            self.text_widget.see(tk.END)
+
+    def _trim(self):
+        excess = len(self.records) - self.first_materialized - self.max_materialized
+        if excess <= 0:
+            return
+        new_first = self.first_materialized + excess
+        self.text_widget.configure(state='normal')
+        self.text_widget.delete("1.0", self._mark(new_first))
+        self.text_widget.configure(state='disabled')
+        for index in range(self.first_materialized, new_first):
+            self.text_widget.mark_unset(self._mark(index))
+            if self.records[index].get("message_id") is not None:
+                self.records[index]["text"] = None # Stored in the chat store, fetched again when needed
+        self.first_materialized = new_first
+
+    def _at_bottom(self):
+        return self.text_widget.yview()[1] >= 0.999
+
+    def _on_yscroll(self, first, last):
+        if self._scrollbar_set is not None:
+            self._scrollbar_set(first, last)
+        if float(first) <= 0.0 and self.first_materialized > 0 and not self._load_pending:
+            self._load_pending = True
+            self.text_widget.after_idle(self._load_older)
+
+    def _load_older(self):
+        """Renders the previous batch of messages above the oldest rendered one."""
+        self._load_pending = False
+        if self.first_materialized == 0:
+            return
+        old_first_mark = self._mark(self.first_materialized)
+        new_first = max(0, self.first_materialized - LOAD_OLDER_BATCH)
+        self._fetch_bodies(new_first, self.first_materialized)
+
+        self.text_widget.configure(state='normal')
+        self.text_widget.mark_set(PREPEND_MARK, "1.0")
+        self.text_widget.mark_gravity(PREPEND_MARK, tk.RIGHT)
+        self.text_widget.mark_gravity(old_first_mark, tk.RIGHT) # Must move down with the inserted text
+        for index in range(new_first, self.first_materialized):
+            mark = self._mark(index)
+            self.text_widget.mark_set(mark, PREPEND_MARK)
+            self.text_widget.mark_gravity(mark, tk.LEFT)
+            self._render(self.records[index], PREPEND_MARK)
+        self.text_widget.mark_gravity(old_first_mark, tk.LEFT)
+        self.text_widget.mark_unset(PREPEND_MARK)
+        self.text_widget.configure(state='disabled')
+
+        self.first_materialized = new_first
+        self.text_widget.yview(old_first_mark) # Keep the message the user was looking at in place
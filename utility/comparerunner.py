@@ -0,0 +1,131 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utility.getmodels import get_local_llm_model_details
+from utility.runllm import run_llm_inference
+from utility.transport import get_transport
+
+DEFAULT_PARALLEL = 2 # Models answering at the same time in compare mode
+MEMORY_HEADROOM = 0.9 # Share of the available memory the models may fill
+
+
+def available_memory_bytes():
+    """Memory available for new allocations, or None when it cannot be determined."""
+    try:
+        import psutil # Optional
+        return psutil.virtual_memory().available
+    except ImportError:
+        pass
+    try:
+        with open("/proc/meminfo", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def plan_parallelism(requested, model_sizes, available_bytes=None):
+    """
+    Returns (parallel, reason): how many of the models may run at once.
+    The requested limit is lowered to OLLAMA_MAX_LOADED_MODELS when that is
+    set (extra requests would only queue inside Ollama, or evict each other)
+    and to the number of models that fit into the available memory together.
+    """
+    parallel = max(1, requested)
+    reason = "requested"
+
+    max_loaded = os.environ.get("OLLAMA_MAX_LOADED_MODELS", "").strip()
+    if max_loaded.isdigit() and 0 < int(max_loaded) < parallel:
+        parallel = int(max_loaded)
+        reason = "OLLAMA_MAX_LOADED_MODELS"
+
+    if available_bytes and model_sizes:
+        # Plan for the worst case: the largest models running together
+        budget = available_bytes * MEMORY_HEADROOM
+        fitting = 0
+        for size in sorted(model_sizes, reverse=True):
+            if budget < size:
+                break
+            budget -= size
+            fitting += 1
+        if max(1, fitting) < parallel:
+            parallel = max(1, fitting)
+            reason = "available memory"
+
+    return parallel, reason
+
+
+class CompareRunner:
+    """
+    Sends one prompt to several models and streams every answer into
+    response_queue as (model, token), like the inference worker does with
+    request ids. A scheduler thread runs at most `parallel` generations at a
+    time; each model's stream starts with "[START_OF_STREAM]" (so the
+    receiver can time it from when it really started) and ends with
+    "[END_OF_STREAM]". The chosen parallelism is sent first as
+    (None, {"parallel": n, "reason": ...}).
+    """
+
+    def __init__(self, response_queue, transport=None, model_residency=None):
+        self.response_queue = response_queue
+        self.transport = transport
+        self.model_residency = model_residency # Protects models that are answering from unloading
+        self.cancel_event = threading.Event()
+        self._executor = None
+
+    def start(self, prompt, models, temperature, parallel=DEFAULT_PARALLEL, seed=None):
+        """Starts the comparison in the background."""
+        self.cancel_event.clear()
+        threading.Thread(
+            target=self._schedule,
+            args=(prompt, list(models), temperature, parallel, seed),
+            name="CompareScheduler",
+            daemon=True
+        ).start()
+
+    def cancel(self):
+        """Stops running answers and drops the ones that did not start yet."""
+        self.cancel_event.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _schedule(self, prompt, models, temperature, parallel, seed):
+        if self.transport is None:
+            self.transport = get_transport()
+
+        _, details = get_local_llm_model_details()
+        sizes = {entry.get("name"): entry.get("size") or 0 for entry in details}
+        parallel, reason = plan_parallelism(
+            min(parallel, len(models)), [sizes.get(model, 0) for model in models], available_memory_bytes()
+        )
+        self.response_queue.put((None, {"parallel": parallel, "reason": reason}))
+
+        self._executor = ThreadPoolExecutor(max_workers=parallel, thread_name_prefix="CompareGeneration")
+        for model in models:
+            try:
+                self._executor.submit(self._run_model, prompt, model, temperature, seed)
+            except RuntimeError:
+                self.response_queue.put((model, "[END_OF_STREAM]")) # Cancelled while scheduling
+        self._executor.shutdown(wait=False)
+
+    def _run_model(self, prompt, model, temperature, seed):
+        if self.cancel_event.is_set():
+            self.response_queue.put((model, "[END_OF_STREAM]"))
+            return
+        if self.model_residency is not None:
+            self.model_residency.begin_use(model)
+        self.response_queue.put((model, "[START_OF_STREAM]"))
+        try:
+            run_llm_inference(
+                prompt, model, temperature, self.response_queue,
+                transport=self.transport,
+                request_id=model,
+                cancel_event=self.cancel_event,
+                seed=seed
+            )
+        finally:
+            if self.model_residency is not None:
+                self.model_residency.end_use(model)
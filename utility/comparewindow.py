@@ -0,0 +1,240 @@
+import queue
+import time
+import tkinter as tk
+from tkinter import scrolledtext
+
+import customtkinter as ctk
+
+from utility.comparerunner import CompareRunner, DEFAULT_PARALLEL
+from utility.streammarkdown import StreamingMarkdownRenderer, configure_markdown_tags
+from utility.telemetry import GenerationTelemetry, build_metrics, format_metrics
+
+POLL_INTERVAL_MS = 16 # About one frame while answers stream
+UI_BUDGET_PER_TICK_MS = 8
+PARALLEL_OPTIONS = ["1", "2", "3", "4"]
+
+
+class _ModelPane:
+    """Header and streamed answer of one model."""
+
+    def __init__(self, master, column, model):
+        self.model = model
+        self.frame = ctk.CTkFrame(master)
+        self.frame.grid(row=0, column=column, padx=5, pady=5, sticky="nsew")
+        self.frame.rowconfigure(1, weight=1)
+        self.frame.columnconfigure(0, weight=1)
+
+        self.header = ctk.CTkLabel(self.frame, text=f"{model}: waiting", font=("Helvetica", 12, "bold"), anchor="w")
+        self.header.grid(row=0, column=0, padx=5, pady=(5, 0), sticky="ew")
+
+        self.text = scrolledtext.ScrolledText(self.frame, wrap=tk.WORD, font=("Helvetica", 12), bd=0, state='disabled')
+        self.text.grid(row=1, column=0, padx=5, pady=5, sticky="nsew")
+        self.text.tag_config("black", foreground="black")
+        configure_markdown_tags(self.text)
+
+        self.renderer = StreamingMarkdownRenderer(self.text, "black")
+        self.text.configure(state='normal')
+        self.renderer.begin()
+        self.text.configure(state='disabled')
+
+        self.telemetry = GenerationTelemetry(model)
+        self.info = None
+        self.done = False
+        self.metrics = None
+
+    def start(self):
+        self.telemetry.sent_at = time.perf_counter() # Timed from when the scheduler really started it
+        self.header.configure(text=f"{self.model}: thinking...")
+
+    def feed(self, text):
+        self.telemetry.token_received()
+        self.text.configure(state='normal')
+        self.renderer.feed(text)
+        self.text.configure(state='disabled')
+        self.text.see(tk.END)
+
+    def finish(self):
+        self.done = True
+        self.telemetry.finish()
+        self.text.configure(state='normal')
+        self.renderer.finish()
+        self.text.configure(state='disabled')
+        if self.info:
+            self.metrics = build_metrics(self.telemetry, self.info)
+            self.header.configure(text=format_metrics(self.metrics))
+        else:
+            self.header.configure(text=f"{self.model}: stopped")
+
+
+class CompareWindow(ctk.CTkToplevel):
+    """
+    Compare mode: one prompt is sent to several models and every answer
+    streams into its own pane. CompareRunner limits how many models answer
+    at once; when all are done, time to first token and tokens/s of every
+    model are shown side by side and appended to the metrics log.
+    """
+
+    def __init__(self, master, models, model_residency=None, metrics_log=None, temperature=0.7):
+        super().__init__(master)
+        self.models = models
+        self.model_residency = model_residency
+        self.metrics_log = metrics_log
+        self.temperature = temperature
+        self.response_queue = queue.Queue()
+        self.runner = None
+        self.panes = {}
+        self.poll_after_id = None
+
+        self.title("Octopus | Compare Models")
+        self.geometry("1100x700")
+        self.rowconfigure(2, weight=1)
+        self.columnconfigure(0, weight=1)
+
+        # Prompt and controls
+        self.prompt_input = ctk.CTkTextbox(self, wrap="word", height=60, font=("Helvetica", 14))
+        self.prompt_input.grid(row=0, column=0, padx=(10, 5), pady=10, sticky="ew")
+
+        self.controls = ctk.CTkFrame(self, fg_color="transparent")
+        self.controls.grid(row=0, column=1, padx=(5, 10), pady=10, sticky="ne")
+
+        self.parallel = ctk.StringVar(value=str(DEFAULT_PARALLEL))
+        ctk.CTkLabel(self.controls, text="Parallel:", font=("Helvetica", 12)).grid(row=0, column=0, padx=5, sticky="w")
+        self.parallel_menu = ctk.CTkOptionMenu(
+            self.controls, values=PARALLEL_OPTIONS, variable=self.parallel, width=70, font=("Helvetica", 12)
+        )
+        self.parallel_menu.grid(row=0, column=1, padx=5)
+
+        self.run_button = ctk.CTkButton(self.controls, text="Compare", width=100, command=self.run, font=("Helvetica", 12, "bold"))
+        self.run_button.grid(row=1, column=0, padx=5, pady=(5, 0))
+        self.stop_button = ctk.CTkButton(
+            self.controls, text="Stop", width=80, command=self.stop, fg_color="red", hover_color="darkred",
+            state="disabled", font=("Helvetica", 12, "bold")
+        )
+        self.stop_button.grid(row=1, column=1, padx=5, pady=(5, 0))
+
+        # Model selection
+        self.model_frame = ctk.CTkScrollableFrame(self, height=60, orientation="horizontal")
+        self.model_frame.grid(row=1, column=0, columnspan=2, padx=10, pady=(0, 5), sticky="ew")
+        self.model_selected = {}
+        for column, model in enumerate(models):
+            selected = ctk.BooleanVar(value=column < 2)
+            ctk.CTkCheckBox(self.model_frame, text=model, variable=selected, font=("Helvetica", 12)).grid(
+                row=0, column=column, padx=5, pady=5, sticky="w"
+            )
+            self.model_selected[model] = selected
+
+        # Answers, one pane per model
+        self.pane_frame = ctk.CTkFrame(self, fg_color="transparent")
+        self.pane_frame.grid(row=2, column=0, columnspan=2, padx=10, pady=(0, 5), sticky="nsew")
+        self.pane_frame.rowconfigure(0, weight=1)
+
+        self.status_label = ctk.CTkLabel(self, text="", font=("Helvetica", 12, "italic"), text_color="gray", anchor="w")
+        self.status_label.grid(row=3, column=0, columnspan=2, padx=10, pady=(0, 10), sticky="ew")
+
+        self.protocol("WM_DELETE_WINDOW", self.on_closing)
+        self.after(100, self.lift) # Keep the window in front of the main window
+
+    def run(self):
+        """Fans the prompt out to the selected models."""
+        prompt = self.prompt_input.get("0.0", "end").strip()
+        models = [model for model, selected in self.model_selected.items() if selected.get()]
+        if not prompt or not models:
+            self.status_label.configure(text="Type a prompt and select at least one model.")
+            return
+        self.stop()
+
+        for child in self.pane_frame.winfo_children():
+            child.destroy()
+        for column in range(len(self.panes)):
+            self.pane_frame.columnconfigure(column, weight=0, uniform="")
+        self.panes = {}
+        for column in range(len(models)):
+            self.pane_frame.columnconfigure(column, weight=1, uniform="panes")
+        for column, model in enumerate(models):
+            self.panes[model] = _ModelPane(self.pane_frame, column, model)
+
+        self.response_queue = queue.Queue() # Nothing of an earlier comparison can leak in
+        self.runner = CompareRunner(self.response_queue, model_residency=self.model_residency)
+        self.runner.start(prompt, models, self.temperature, parallel=int(self.parallel.get()))
+        self.run_button.configure(state="disabled")
+        self.stop_button.configure(state="normal")
+        self.status_label.configure(text=f"Comparing {len(models)} model(s)...")
+        self._schedule_poll()
+
+    def stop(self):
+        """Stops all answers of the running comparison."""
+        if self.runner is None:
+            return
+        self.runner.cancel()
+        self.runner = None
+        for pane in self.panes.values():
+            if not pane.done:
+                pane.finish()
+        self._finish()
+
+    def _schedule_poll(self):
+        if self.poll_after_id is not None:
+            self.after_cancel(self.poll_after_id)
+        self.poll_after_id = self.after(POLL_INTERVAL_MS, self.poll_response_queue)
+
+    def poll_response_queue(self):
+        """Drains the shared queue within a small budget and feeds each pane once per tick."""
+        self.poll_after_id = None
+        if self.runner is None:
+            return
+        tick_start = time.perf_counter()
+        pending = {}
+        finished = []
+        while time.perf_counter() - tick_start < UI_BUDGET_PER_TICK_MS / 1000.0:
+            try:
+                model, token = self.response_queue.get_nowait()
+            except queue.Empty:
+                break
+            if model is None:
+                self.status_label.configure(
+                    text=f"Comparing {len(self.panes)} model(s), {token['parallel']} at a time ({token['reason']})"
+                )
+                continue
+            pane = self.panes.get(model)
+            if pane is None or pane.done:
+                continue
+            if token == "[START_OF_STREAM]":
+                pane.start()
+            elif token == "[END_OF_STREAM]":
+                finished.append(pane)
+            elif isinstance(token, dict):
+                pane.info = token
+            else:
+                pending.setdefault(model, []).append(token)
+
+        for model, tokens in pending.items():
+            self.panes[model].feed("".join(tokens))
+        for pane in finished:
+            pane.finish()
+
+        if all(pane.done for pane in self.panes.values()):
+            self.runner = None
+            self._finish()
+        else:
+            self._schedule_poll()
+
+    def _finish(self):
+        """Shows the per-model numbers and logs them."""
+        self.run_button.configure(state="normal")
+        self.stop_button.configure(state="disabled")
+        results = [pane.metrics for pane in self.panes.values() if pane.metrics]
+        for metrics in results:
+            metrics["compare"] = True
+            if self.metrics_log is not None:
+                self.metrics_log.append(metrics)
+        ranked = sorted(results, key=lambda metrics: metrics["tokens_per_second"] or 0.0, reverse=True)
+        summary = [
+            f"{metrics['model']}: TTFT {metrics['time_to_first_token_ms'] or 0:.0f} ms, "
+            f"{metrics['tokens_per_second'] or 0:.1f} tok/s"
+            for metrics in ranked
+        ]
+        self.status_label.configure(text=" | ".join(summary) if summary else "Comparison stopped.")
+
+    def on_closing(self):
+        self.stop()
+        self.destroy()
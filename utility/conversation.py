@@ -0,0 +1,106 @@
+DEFAULT_NUM_CTX = 4096       # Context window requested from Ollama (options.num_ctx)
+RESPONSE_RESERVE_TOKENS = 1024 # Room kept free for the model's answer
+COMPACT_TARGET_RATIO = 0.5   # After trimming, the kept history uses at most this share of num_ctx
+CHARS_PER_TOKEN = 4          # Rough estimate used until Ollama reports real counts
+
+
+def estimate_tokens(text):
+    """Cheap token estimate for text that Ollama has not counted yet."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+class Conversation:
+    """
+    Multi-turn conversation state for one chat.
+    While the history fits, every turn sends only the new prompt together with
+    the Ollama context vector returned by the previous turn, so the server
+    reuses its cache instead of re-evaluating the whole transcript. When the
+    next turn would not fit in num_ctx the oldest turns are dropped and the
+    kept history is sent once as text; after that the context vector is
+    carried again.
+    """
+
+    def __init__(self, num_ctx=DEFAULT_NUM_CTX, reserve_tokens=RESPONSE_RESERVE_TOKENS):
+        self.num_ctx = num_ctx
+        self.reserve_tokens = reserve_tokens
+        self.turns = [] # {"user": ..., "assistant": ..., "tokens": ...} per completed turn
+        self.context = None # Context vector of the history, None when it must be resent as text
+        self.model = None
+        self.trimmed_turns = 0
+        self.history_resent = False # True when the pending turn carries the history as text
+
+    def reset(self):
+        """Forgets the whole conversation."""
+        self.turns = []
+        self.context = None
+        self.model = None
+        self.trimmed_turns = 0
+        self.history_resent = False
+
+    def restore(self, turns):
+        """Starts from stored (user_text, response_text) pairs, e.g. of a reopened session."""
+        self.reset()
+        for user_text, response_text in turns:
+            self.turns.append({
+                "user": user_text,
+                "assistant": response_text,
+                "tokens": estimate_tokens(user_text) + estimate_tokens(response_text)
+            })
+
+    def prepare(self, model, user_text):
+        """
+        Returns (prompt, context) for the next turn, trimming old turns first if
+        the history plus the new prompt would not fit in the token budget.
+        """
+        if model != self.model:
+            # Context vectors are tokens of one model; another model needs the text
+            self.context = None
+            self.model = model
+
+        budget = self.num_ctx - self.reserve_tokens
+        if self.context is not None:
+            if len(self.context) + estimate_tokens(user_text) <= budget:
+                self.history_resent = False
+                return user_text, self.context
+            self.context = None
+
+        self._trim(budget - estimate_tokens(user_text))
+        self.history_resent = bool(self.turns)
+        return self._build_prompt(user_text), None
+
+    def record(self, user_text, response_text, info=None):
+        """
+        Stores a finished turn. info is the final generation info from Ollama
+        (context vector and token counts); without it (stopped or failed
+        generation) the history is resent as text on the next turn.
+        """
+        info = info or {}
+        # A resent history is counted in prompt_eval_count, so only trust it for single turns
+        prompt_tokens = None if self.history_resent else info.get("prompt_eval_count")
+        tokens = (prompt_tokens or estimate_tokens(user_text)) + (info.get("eval_count") or estimate_tokens(response_text))
+        self.turns.append({"user": user_text, "assistant": response_text, "tokens": tokens})
+        self.context = info.get("context") or None
+
+    def _trim(self, available_tokens):
+        """Drops the oldest turns until the history fits the available tokens."""
+        used = sum(turn["tokens"] for turn in self.turns)
+        if used <= available_tokens:
+            return
+        target = min(available_tokens, int(self.num_ctx * COMPACT_TARGET_RATIO))
+        while self.turns and used > target:
+            used -= self.turns.pop(0)["tokens"]
+            self.trimmed_turns += 1
+
+    def _build_prompt(self, user_text):
+        """Builds a plain text prompt that carries the kept history."""
+        if not self.turns:
+            return user_text
+        lines = ["Conversation so far:"]
+        if self.trimmed_turns:
+            lines.append("(earlier messages were omitted)")
+        for turn in self.turns:
+            lines.append(f"User: {turn['user']}")
+            lines.append(f"Assistant: {turn['assistant']}")
+        lines.append("")
+        lines.append(f"User: {user_text}")
+        return "\n".join(lines)
@@ -0,0 +1,53 @@
+import time
+
+from utility.getmodels import get_local_llm_models
+from utility.startollama import start_ollama_process
+
+# Readiness probing after starting the server: 0.1s, 0.2s, 0.4s ... capped at 2s
+PROBE_INITIAL_DELAY = 0.1
+PROBE_MAX_DELAY = 2.0
+PROBE_TIMEOUT = 20.0
+
+
+def detect_ollama(result_queue, auto_start=True, log_path=None):
+    """
+    Detects the Ollama server and its models. Meant to run in a background
+    thread so the window can appear immediately. Results are sent to
+    result_queue as (kind, payload):
+        ("status", message)          progress message for the user
+        ("server_process", process)  Popen object of a server we started
+        ("models", [names])          server is up (the list may be empty)
+        ("error", message)           server is not reachable
+    A server started here writes its output to log_path (rotating), if given.
+    """
+    ollama_running, detected_models = get_local_llm_models()
+    if ollama_running:
+        result_queue.put(("models", detected_models))
+        return
+
+    if not auto_start:
+        result_queue.put(("error", "Ollama server not detected. Please start Ollama manually."))
+        return
+
+    result_queue.put(("status", "Attempting to start Ollama server..."))
+    process = start_ollama_process(log_path)
+    if not process:
+        result_queue.put(("error", "Could not initiate Ollama server startup process. Check your Ollama installation and PATH."))
+        return
+    result_queue.put(("server_process", process))
+
+    # Give Ollama some time to start up, probing with exponential backoff
+    delay = PROBE_INITIAL_DELAY
+    deadline = time.monotonic() + PROBE_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(delay)
+        ollama_running, detected_models = get_local_llm_models() # Re-check
+        if ollama_running:
+            result_queue.put(("status", "Ollama server started successfully. Fetching models..."))
+            result_queue.put(("models", detected_models))
+            return
+        if process.poll() is not None:
+            break # The server exited, no point in waiting
+        delay = min(delay * 2, PROBE_MAX_DELAY)
+
+    result_queue.put(("error", "Failed to start Ollama server or connect to it. Please start Ollama manually."))
@@ -0,0 +1,267 @@
+import importlib.util
+import json
+import os
+import threading
+
+from utility.textchunks import chunk_text
+from utility.transport import get_transport
+
+DEFAULT_EMBED_MODEL = "nomic-embed-text" # Pull it with: ollama pull nomic-embed-text
+EMBED_BATCH_SIZE = 32 # Chunks per /api/embed request
+EMBED_TIMEOUT = 120.0
+DEFAULT_TOP_K = 4
+MIN_SCORE = 0.3 # Chunks less similar than this are not worth the prompt space
+FLOAT32_BYTES = 4
+
+TEXT_EXTENSIONS = {
+    ".txt", ".md", ".markdown", ".rst", ".py", ".js", ".ts", ".java", ".c", ".h", ".cpp", ".cs", ".go",
+    ".rs", ".json", ".yaml", ".yml", ".toml", ".ini", ".cfg", ".csv", ".html", ".xml", ".sql", ".sh", ".log",
+}
+
+
+def build_rag_prompt(prompt, hits):
+    """Puts the retrieved excerpts in front of the prompt."""
+    if not hits:
+        return prompt
+    excerpts = "\n\n".join(
+        f"[{number}] From {os.path.basename(hit['path'])}:\n{hit['text']}" for number, hit in enumerate(hits, 1)
+    )
+    return (
+        "Use the following excerpts from the user's documents if they are relevant to the question.\n\n"
+        f"{excerpts}\n\n"
+        f"{prompt}"
+    )
+
+
+def _numpy():
+    """Imports numpy on first use; it is optional and too slow to import at startup."""
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("Document retrieval needs numpy (pip install numpy).")
+    return numpy
+
+
+class DocumentIndex:
+    """
+    Embedding index of local text files for retrieval (RAG).
+    Files are cut into chunks and embedded through Ollama's /api/embed in
+    batches. The normalized vectors are stored as one float32 matrix that is
+    memory-mapped for search, so cosine similarity against all chunks is a
+    single matrix-vector product. Metadata (files with size and mtime, and
+    the text of every chunk) is kept in a JSON file next to it.
+    Re-indexing is incremental: only new or changed files are embedded
+    again, and chunks of deleted files are dropped. If the vector file does
+    not match the metadata (e.g. after a crash between writing the two), the
+    index is treated as empty and every file is embedded again on refresh.
+    """
+
+    def __init__(self, directory, transport=None, embed_model=DEFAULT_EMBED_MODEL):
+        self.directory = directory
+        self.transport = transport
+        self.embed_model = embed_model
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.meta_path = os.path.join(directory, "index.json")
+        self._lock = threading.Lock()
+        self._matrix = None # Memory map of the vectors, opened on first search
+        self._meta = None # Loaded on first use, off the startup path
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def meta(self):
+        if self._meta is None:
+            meta = {"embed_model": self.embed_model, "dim": 0, "files": {}, "chunks": []}
+            try:
+                with open(self.meta_path, "r", encoding="utf-8") as f:
+                    stored = json.load(f)
+                if stored.get("embed_model") == self.embed_model:
+                    meta = stored # Vectors of another model cannot be mixed with new ones
+            except (OSError, ValueError):
+                pass
+            self._meta = meta
+            if not self._vectors_match():
+                self._mark_stale()
+        return self._meta
+
+    def _vectors_match(self):
+        """True when the vector file holds exactly the rows the metadata describes."""
+        rows = len(self._meta["chunks"])
+        if self._meta.get("rows", rows) != rows:
+            return False
+        if not rows:
+            return True
+        try:
+            size = os.path.getsize(self.vectors_path)
+        except OSError:
+            return False
+        return size == rows * self._meta["dim"] * FLOAT32_BYTES
+
+    def _mark_stale(self):
+        """Drops the unusable vectors; the files stay known so refresh() embeds them again."""
+        self._matrix = None
+        self._meta["chunks"] = []
+        self._meta["rows"] = 0
+        for entry in self._meta["files"].values():
+            entry["size"] = -1 # Never matches, so the file counts as changed
+
+    @staticmethod
+    def available():
+        return importlib.util.find_spec("numpy") is not None
+
+    def __len__(self):
+        return len(self.meta["chunks"])
+
+    def file_count(self):
+        return len(self.meta["files"])
+
+    # --- Indexing ---
+
+    def add_paths(self, paths, progress=None):
+        """
+        Indexes files and folders (recursively, text files only), re-embedding
+        only what changed since the last run. progress(message) is called
+        while embedding. Returns counts of added, updated, unchanged and
+        removed files.
+        """
+        files = []
+        for path in paths:
+            path = os.path.abspath(path)
+            if os.path.isdir(path):
+                for root, dirs, names in os.walk(path):
+                    dirs[:] = [name for name in dirs if not name.startswith(".")]
+                    files.extend(
+                        os.path.join(root, name) for name in sorted(names)
+                        if os.path.splitext(name)[1].lower() in TEXT_EXTENSIONS
+                    )
+            elif os.path.isfile(path):
+                files.append(path)
+        return self._update(files, [], progress)
+
+    def refresh(self, progress=None):
+        """Re-indexes changed files and drops deleted ones."""
+        existing = [path for path in self.meta["files"] if os.path.isfile(path)]
+        removed = [path for path in self.meta["files"] if not os.path.isfile(path)]
+        return self._update(existing, removed, progress)
+
+    def _update(self, files, removed, progress):
+        np = _numpy()
+        stats = {"added": 0, "updated": 0, "unchanged": 0, "removed": len(removed)}
+        known = self.meta["files"]
+        changed = []
+        for path in files:
+            stat = os.stat(path)
+            entry = known.get(path)
+            if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+                stats["unchanged"] += 1
+                continue
+            stats["updated" if entry else "added"] += 1
+            changed.append((path, stat))
+        if not changed and not removed:
+            return stats
+
+        # Chunk and embed the changed files
+        new_chunks = []
+        for path, _ in changed:
+            try:
+                with open(path, "r", encoding="utf-8", errors="replace") as f:
+                    text = f.read()
+            except OSError:
+                continue
+            new_chunks.extend({"path": path, "offset": offset, "text": chunk} for offset, chunk in chunk_text(text))
+        new_vectors = self._embed([chunk["text"] for chunk in new_chunks], progress)
+
+        # Keep the rows of untouched files, append the new ones
+        dropped = {path for path, _ in changed} | set(removed)
+        keep = [row for row, chunk in enumerate(self.meta["chunks"]) if chunk["path"] not in dropped]
+        with self._lock:
+            old = self._open_matrix()
+            kept_vectors = old[keep] if old is not None and keep else None
+            self._matrix = None # Release the memory map before the file is replaced
+            del old
+
+            parts = [part for part in (kept_vectors, new_vectors) if part is not None and len(part)]
+            matrix = np.concatenate(parts) if parts else np.zeros((0, self.meta["dim"] or 1), dtype=np.float32)
+            temporary = self.vectors_path + ".tmp"
+            matrix.astype(np.float32).tofile(temporary)
+            os.replace(temporary, self.vectors_path)
+
+            self.meta["chunks"] = [self.meta["chunks"][row] for row in keep] + new_chunks
+            for path in dropped:
+                known.pop(path, None)
+            for path, stat in changed:
+                known[path] = {"size": stat.st_size, "mtime": stat.st_mtime}
+            if len(matrix):
+                self.meta["dim"] = int(matrix.shape[1])
+            self.meta["rows"] = int(len(matrix))
+            self._save_meta()
+        return stats
+
+    def _embed(self, texts, progress=None):
+        """Embeds texts in batches and returns a normalized float32 matrix."""
+        if not texts:
+            return None
+        np = _numpy()
+        if self.transport is None:
+            self.transport = get_transport()
+        batches = []
+        for start in range(0, len(texts), EMBED_BATCH_SIZE):
+            if progress:
+                progress(f"Embedding chunks {start + 1}-{min(start + EMBED_BATCH_SIZE, len(texts))} of {len(texts)}...")
+            data = self.transport.post_json(
+                "/api/embed",
+                {"model": self.embed_model, "input": texts[start:start + EMBED_BATCH_SIZE]},
+                timeout=EMBED_TIMEOUT
+            )
+            batches.append(np.asarray(data["embeddings"], dtype=np.float32))
+        vectors = np.concatenate(batches)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _open_matrix(self):
+        """Memory-maps the vector file (read only); None while the index is empty or stale."""
+        if self._matrix is None and self.meta["chunks"]:
+            if not self._vectors_match():
+                self._mark_stale() # Changed on disk since the metadata was loaded
+                return None
+            np = _numpy()
+            self._matrix = np.memmap(
+                self.vectors_path, dtype=np.float32, mode="r", shape=(len(self.meta["chunks"]), self.meta["dim"])
+            )
+        return self._matrix
+
+    def _save_meta(self):
+        temporary = self.meta_path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f)
+        os.replace(temporary, self.meta_path)
+
+    def clear(self):
+        """Forgets every indexed file."""
+        with self._lock:
+            self._matrix = None
+            self._meta = {"embed_model": self.embed_model, "dim": 0, "files": {}, "chunks": []}
+            for path in (self.vectors_path, self.meta_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    # --- Search ---
+
+    def search(self, query, k=DEFAULT_TOP_K, min_score=MIN_SCORE):
+        """Returns the k chunks most similar to query as dicts with path, text and score."""
+        if not self.meta["chunks"] or not self.available():
+            return []
+        np = _numpy()
+        query_vector = self._embed([query])[0]
+        with self._lock:
+            matrix = self._open_matrix()
+            if matrix is None:
+                return []
+            scores = matrix @ query_vector # Cosine similarity, the rows are normalized
+            k = min(k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [
+                {"path": self.meta["chunks"][row]["path"], "text": self.meta["chunks"][row]["text"], "score": float(scores[row])}
+                for row in top if scores[row] >= min_score
+            ]
@@ -1,14 +1,27 @@
-import requests
-import json
+from utility.transport import OllamaError, get_transport
+
+def get_local_llm_model_details():
+    """
+    Attempt to detect local LLM models from Ollama.
+    Returns (ollama_running, models) where models are the /api/tags entries
+    (name, digest, size, ...).
+    """
+    try:
+        data = get_transport().get_json("/api/tags", timeout=1)
+        return True, data.get("models", [])
+    except OllamaError:
+        return False, []
 
 def get_local_llm_models():
     """Attempt to detect local LLM models from Ollama."""
-    try:
-        response = requests.get("http://localhost:11434/api/tags", timeout=1)
-        response.raise_for_status()
-        data = response.json()
-        models = [model["name"] for model in data.get("models", [])]
-        return True, models 
-        return models
-    except requests.RequestException:
-        return False, []
\ No newline at end of file
+    ollama_running, details = get_local_llm_model_details()
+    models = [model["name"] for model in details]
+    return ollama_running, models
+
+def get_model_digest(model):
+    """Returns the digest of an installed model, or None if it is unknown."""
+    _, details = get_local_llm_model_details()
+    for entry in details:
+        if entry.get("name") == model:
+            return entry.get("digest")
+    return None
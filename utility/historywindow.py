@@ -0,0 +1,76 @@
+import time
+
+import customtkinter as ctk
+
+
+class HistoryWindow(ctk.CTkToplevel):
+    """
+    Lists stored conversations (metadata only) and searches them.
+    Clicking a session calls on_open(session_id); the main window then loads
+    the message bodies lazily.
+    """
+
+    def __init__(self, master, chat_store, on_open):
+        super().__init__(master)
+        self.chat_store = chat_store
+        self.on_open = on_open
+
+        self.title("Octopus | Conversation History")
+        self.geometry("520x600")
+        self.rowconfigure(1, weight=1)
+        self.columnconfigure(0, weight=1)
+
+        # Search bar
+        self.search_entry = ctk.CTkEntry(self, placeholder_text="Search all conversations...", font=("Helvetica", 12))
+        self.search_entry.grid(row=0, column=0, padx=(10, 5), pady=10, sticky="ew")
+        self.search_entry.bind("<Return>", lambda event: self.refresh())
+
+        self.search_button = ctk.CTkButton(self, text="Search", width=80, command=self.refresh, font=("Helvetica", 12))
+        self.search_button.grid(row=0, column=1, padx=(5, 10), pady=10)
+
+        # Session list
+        self.session_list = ctk.CTkScrollableFrame(self)
+        self.session_list.grid(row=1, column=0, columnspan=2, padx=10, pady=(0, 10), sticky="nsew")
+        self.session_list.columnconfigure(0, weight=1)
+
+        self.refresh()
+        self.after(100, self.lift) # Keep the window in front of the main window
+
+    def refresh(self):
+        """Shows all sessions, or the search results when a query is typed."""
+        for child in self.session_list.winfo_children():
+            child.destroy()
+
+        query = self.search_entry.get().strip()
+        if query:
+            sessions = self.chat_store.search(query)
+        else:
+            sessions = self.chat_store.list_sessions()
+
+        if not sessions:
+            ctk.CTkLabel(self.session_list, text="No conversations found.", text_color="gray").grid(
+                row=0, column=0, padx=5, pady=5, sticky="w"
+            )
+            return
+
+        for row, session in enumerate(sessions):
+            updated = time.strftime("%Y-%m-%d %H:%M", time.localtime(session["updated"]))
+            if "snippet" in session:
+                detail = session["snippet"].replace("\n", " ")
+            else:
+                detail = f"{session['message_count']} messages"
+            button = ctk.CTkButton(
+                self.session_list,
+                text=f"{session['title']}\n{updated} | {detail}",
+                anchor="w",
+                font=("Helvetica", 12),
+                fg_color="transparent",
+                text_color=("black", "white"),
+                hover_color=("gray85", "gray25"),
+                command=lambda session_id=session["id"]: self.open_session(session_id)
+            )
+            button.grid(row=row, column=0, padx=5, pady=2, sticky="ew")
+
+    def open_session(self, session_id):
+        self.on_open(session_id)
+        self.destroy()
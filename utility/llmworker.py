@@ -0,0 +1,197 @@
+import itertools
+import queue
+import threading
+import time
+
+from utility.docindex import build_rag_prompt
+from utility.getmodels import get_model_digest
+from utility.mapreduce import run_map_reduce
+from utility.responsecache import ResponseCache, is_deterministic, split_for_replay
+from utility.runllm import run_llm_inference
+from utility.transport import get_transport
+
+
+class _RecordingQueue:
+    """Forwards (request_id, item) pairs to a queue and keeps the answer for the cache."""
+
+    def __init__(self, target):
+        self.target = target
+        self.tokens = []
+        self.info = None
+
+    def put(self, item):
+        self.target.put(item)
+        _, token = item
+        if isinstance(token, dict):
+            self.info = token
+        elif token != "[END_OF_STREAM]":
+            self.tokens.append(token)
+
+
+class InferenceWorker(threading.Thread):
+    """
+    Long-lived inference worker. It is started once, uses the shared Ollama
+    transport (and so its pooled keep-alive connections), takes generation jobs
+    from a command queue and streams tokens back as (request_id, token).
+    With a response_cache, deterministic requests that were answered before
+    are replayed through the same queue without contacting Ollama. With a
+    document_index, jobs that carry a retrieval_query get the most relevant
+    document chunks put in front of their prompt. Texts too long for one
+    request are answered by map-reduce (see submit_long).
+    """
+
+    def __init__(self, response_queue, transport=None, response_cache=None, document_index=None):
+        super().__init__(name="InferenceWorker", daemon=True)
+        self.response_queue = response_queue
+        self.transport = transport
+        self.response_cache = response_cache
+        self.document_index = document_index
+        self.commands = queue.Queue()
+        self._request_ids = itertools.count(1)
+        self._current_id = None
+        self._last_started_id = 0 # Ids are increasing, so higher ones are still queued
+        self._cancelled_ids = set() # Queued requests cancelled before they started
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    def submit(self, prompt, model, temperature, context=None, num_ctx=None, seed=None, use_cache=False, keep_alive=None,
+               retrieval_query=None):
+        """
+        Queues a generation job and returns its request id. retrieval_query
+        (usually the user's question) looks up document chunks for the prompt.
+        """
+        request_id = next(self._request_ids)
+        job = dict(prompt=prompt, model=model, temperature=temperature, context=context, num_ctx=num_ctx, seed=seed,
+                   keep_alive=keep_alive)
+        self.commands.put(("generate", request_id, (job, use_cache, retrieval_query, time.perf_counter())))
+        return request_id
+
+    def submit_long(self, text, model, temperature, num_ctx=None, keep_alive=None):
+        """
+        Queues a text that does not fit into the context window and returns
+        its request id. It is processed in parts (see run_map_reduce); progress
+        arrives as {"progress": message} items before the streamed answer.
+        """
+        request_id = next(self._request_ids)
+        job = dict(text=text, model=model, temperature=temperature, num_ctx=num_ctx, keep_alive=keep_alive)
+        self.commands.put(("map_reduce", request_id, (job, time.perf_counter())))
+        return request_id
+
+    def cancel(self, request_id=None):
+        """
+        Cancels the running job, or only the given request. Its connection to
+        Ollama is closed right away, also while the model is still loading or
+        reading the prompt; no process is killed. A request that is still
+        queued is skipped when its turn comes.
+        """
+        abort = False
+        with self._lock:
+            if self._current_id is not None and request_id in (None, self._current_id):
+                self._cancel_event.set()
+                abort = True
+            elif request_id is not None and request_id > self._last_started_id:
+                self._cancelled_ids.add(request_id)
+        if abort and self.transport is not None:
+            self.transport.abort(self._cancel_event) # Also the parallel parts of a map-reduce job
+
+    def shutdown(self):
+        """Cancels the running job and tells the worker loop to exit."""
+        self.cancel()
+        self.commands.put(("stop", None, None))
+
+    def run(self):
+        if self.transport is None:
+            self.transport = get_transport() # Created here, off the UI thread
+
+        while True:
+            command, request_id, args = self.commands.get()
+            if command == "stop":
+                break
+
+            with self._lock:
+                self._last_started_id = request_id
+                if request_id in self._cancelled_ids:
+                    self._cancelled_ids.discard(request_id)
+                    self.response_queue.put((request_id, "[END_OF_STREAM]"))
+                    continue
+                self._current_id = request_id
+                self._cancel_event.clear()
+
+            try:
+                if command == "map_reduce":
+                    job, submitted_at = args
+                    run_map_reduce(
+                        response_queue=self.response_queue,
+                        transport=self.transport,
+                        request_id=request_id,
+                        cancel_event=self._cancel_event,
+                        extra_info={"queue_wait_ms": (time.perf_counter() - submitted_at) * 1000.0},
+                        **job
+                    )
+                else:
+                    job, use_cache, retrieval_query, submitted_at = args
+                    extra_info = {"queue_wait_ms": (time.perf_counter() - submitted_at) * 1000.0}
+                    if retrieval_query and self.document_index is not None:
+                        self._add_documents(job, retrieval_query, extra_info)
+                    self._run_job(request_id, job, use_cache, extra_info)
+            except Exception as e:
+                # One failing job must not take the worker, and every later prompt, down with it
+                self.response_queue.put((request_id, f"Error: {e}"))
+                self.response_queue.put((request_id, "[END_OF_STREAM]"))
+            finally:
+                with self._lock:
+                    self._current_id = None
+
+    def _add_documents(self, job, query, extra_info):
+        """Puts the document chunks most similar to query in front of the job's prompt."""
+        started = time.perf_counter()
+        try:
+            hits = self.document_index.search(query)
+        except Exception as e:
+            extra_info["retrieval_error"] = str(e) # Answer without documents rather than not at all
+            return
+        job["prompt"] = build_rag_prompt(job["prompt"], hits)
+        extra_info["sources"] = sorted({hit["path"] for hit in hits})
+        extra_info["retrieval_ms"] = (time.perf_counter() - started) * 1000.0
+
+    def _run_job(self, request_id, job, use_cache, extra_info):
+        """Answers one job from the cache or from Ollama."""
+        cache_key = None
+        if use_cache and self.response_cache is not None:
+            options = {"temperature": job["temperature"], "num_ctx": job["num_ctx"], "seed": job["seed"]}
+            if is_deterministic(options):
+                digest = get_model_digest(job["model"])
+                cache_key = ResponseCache.make_key(job["model"], digest, job["prompt"], job["context"], options)
+                cached = self.response_cache.get(cache_key)
+                if cached is not None:
+                    self._replay(request_id, cached, extra_info)
+                    return
+
+        target = self.response_queue if cache_key is None else _RecordingQueue(self.response_queue)
+        run_llm_inference(
+            response_queue=target,
+            transport=self.transport,
+            request_id=request_id,
+            cancel_event=self._cancel_event,
+            extra_info=extra_info,
+            **job
+        )
+
+        # Only completed generations come with final info; stopped or failed ones are not cached
+        if cache_key is not None and target.info is not None:
+            self.response_cache.put(cache_key, "".join(target.tokens), target.info)
+
+    def _replay(self, request_id, cached, extra_info):
+        """Streams a cached answer exactly like a live generation."""
+        for piece in split_for_replay(cached["response"]):
+            if self._cancel_event.is_set():
+                break
+            self.response_queue.put((request_id, piece))
+        else:
+            info = dict(cached.get("info") or {})
+            info.update(extra_info)
+            info["cached"] = True
+            for key in ("total_duration", "load_duration", "prompt_eval_duration", "eval_duration"):
+                info[key] = 0 # Nothing was evaluated for this answer
+            self.response_queue.put((request_id, info))
+        self.response_queue.put((request_id, "[END_OF_STREAM]"))
@@ -0,0 +1,145 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utility.conversation import CHARS_PER_TOKEN, DEFAULT_NUM_CTX, RESPONSE_RESERVE_TOKENS, estimate_tokens
+from utility.textchunks import chunk_text
+from utility.runllm import run_llm_inference
+
+DEFAULT_PARALLEL_SLOTS = 4 # Ollama's default for OLLAMA_NUM_PARALLEL when memory allows
+PROMPT_OVERHEAD_TOKENS = 200 # Room for the instructions wrapped around every chunk
+CHUNK_OVERLAP_CHARS = 200
+MAX_INSTRUCTION_CHARS = 500 # A first paragraph up to this long is read as the task for the text
+DEFAULT_INSTRUCTION = "Summarize the following text."
+MAX_ROUNDS = 4 # Rounds of condensing notes before the rest is cut off
+
+
+def server_parallel_slots():
+    """Requests one model can serve at the same time (OLLAMA_NUM_PARALLEL)."""
+    value = os.environ.get("OLLAMA_NUM_PARALLEL", "").strip()
+    return int(value) if value.isdigit() and int(value) > 0 else DEFAULT_PARALLEL_SLOTS
+
+
+def input_budget_tokens(num_ctx=DEFAULT_NUM_CTX):
+    """Tokens of input that fit into one request next to the answer."""
+    return num_ctx - RESPONSE_RESERVE_TOKENS - PROMPT_OVERHEAD_TOKENS
+
+
+def is_long_input(text, num_ctx=DEFAULT_NUM_CTX):
+    """True when text does not fit into one request and has to be processed in parts."""
+    return estimate_tokens(text) > input_budget_tokens(num_ctx)
+
+
+def split_instruction(text):
+    """
+    Separates a short task written above a pasted document ("Summarize the
+    risks in this contract:") from the document itself.
+    Returns (instruction, document).
+    """
+    first, separator, rest = text.partition("\n\n")
+    if separator and len(first) <= MAX_INSTRUCTION_CHARS and len(rest) > len(first):
+        return first.strip(), rest
+    return DEFAULT_INSTRUCTION, text
+
+
+class _Collector:
+    """Queue stand-in that keeps one non-streamed answer."""
+
+    def __init__(self):
+        self.parts = []
+        self.info = None
+
+    def put(self, token):
+        if isinstance(token, dict):
+            self.info = token
+        elif token != "[END_OF_STREAM]":
+            self.parts.append(token)
+
+
+def run_map_reduce(text, model, temperature, response_queue, transport=None, request_id=None, cancel_event=None,
+                   num_ctx=DEFAULT_NUM_CTX, keep_alive=None, parallel=None, extra_info=None):
+    """
+    Answers a text that is too long for one request.
+    Map: the text is cut into token-bounded chunks that are processed
+    concurrently, as many at once as the server has parallel slots.
+    Reduce: the partial results are combined in a final request that is
+    streamed to response_queue like any other answer (tokens, final info,
+    [END_OF_STREAM]). If the partial results are still too long they are
+    combined in further rounds first.
+    Progress is sent as {"progress": message} items, so the receiver must
+    tell them apart from the final info dict.
+    """
+    def emit(item):
+        response_queue.put(item if request_id is None else (request_id, item))
+
+    instruction, document = split_instruction(text)
+    num_ctx = num_ctx or DEFAULT_NUM_CTX
+    parallel = parallel or server_parallel_slots()
+    chunk_chars = max(1000, (input_budget_tokens(num_ctx) - estimate_tokens(instruction)) * CHARS_PER_TOKEN)
+    started = time.perf_counter()
+    sequential_ms = 0.0 # Sum of the request times, i.e. what running them one by one would take
+
+    def process(prompt):
+        request_started = time.perf_counter()
+        collector = _Collector()
+        run_llm_inference(
+            prompt, model, temperature, collector,
+            transport=transport, cancel_event=cancel_event, num_ctx=num_ctx, keep_alive=keep_alive
+        )
+        if collector.info is None and not (cancel_event is not None and cancel_event.is_set()):
+            raise RuntimeError("".join(collector.parts) or "No answer for a part of the text")
+        return "".join(collector.parts), (time.perf_counter() - request_started) * 1000.0
+
+    try:
+        parts = [chunk for _, chunk in chunk_text(document, chunk_chars, CHUNK_OVERLAP_CHARS)]
+        total_parts = len(parts)
+        round_number = 1
+        with ThreadPoolExecutor(max_workers=parallel, thread_name_prefix="MapReduce") as executor:
+            while True:
+                prompts = [
+                    f"{instruction}\n\nThe text is too long to read at once. This is part {number} of {len(parts)}. "
+                    "Write down everything in it that matters for the task, concisely.\n\n---\n"
+                    f"{part}"
+                    for number, part in enumerate(parts, 1)
+                ]
+                results = []
+                for done, (notes, request_ms) in enumerate(executor.map(process, prompts), 1):
+                    if cancel_event is not None and cancel_event.is_set():
+                        emit("[END_OF_STREAM]")
+                        return
+                    results.append(notes)
+                    sequential_ms += request_ms
+                    emit({"progress": f"Reading part {done} of {len(parts)} (round {round_number}, {parallel} at a time)..."})
+
+                combined = "\n\n".join(f"[Part {number}]\n{notes}" for number, notes in enumerate(results, 1))
+                if estimate_tokens(combined) <= input_budget_tokens(num_ctx) - estimate_tokens(instruction):
+                    break
+                if round_number == MAX_ROUNDS:
+                    combined = combined[:chunk_chars] # The notes do not get shorter; answer from what fits
+                    break
+                # The notes are still too long for one request: condense them once more
+                parts = [chunk for _, chunk in chunk_text(combined, chunk_chars, 0)]
+                round_number += 1
+
+        map_ms = (time.perf_counter() - started) * 1000.0
+        emit({"progress": f"Combining {total_parts} parts..."})
+        info = dict(extra_info or {})
+        info.update({"parts": total_parts, "map_rounds": round_number, "map_ms": map_ms,
+                     "map_sequential_ms": sequential_ms, "parallel": parallel})
+        reduce_prompt = (
+            f"{instruction}\n\nThe text was too long to read at once, so it was read in parts. "
+            "These are the notes taken for each part, in order:\n\n"
+            f"{combined}\n\n"
+            "Using these notes, complete the task for the whole text."
+        )
+    except Exception as e:
+        emit(f"Error processing the long text: {e}")
+        emit("[END_OF_STREAM]")
+        return
+
+    # Reduce, streamed like a normal answer (run_llm_inference sends the end marker)
+    run_llm_inference(
+        reduce_prompt, model, temperature, response_queue,
+        transport=transport, request_id=request_id, cancel_event=cancel_event,
+        num_ctx=num_ctx, keep_alive=keep_alive, extra_info=info
+    )
@@ -0,0 +1,191 @@
+import queue
+import threading
+import time
+
+from utility.transport import OllamaError, get_transport
+
+DEFAULT_KEEP_ALIVE = "30m" # How long Ollama keeps an idle model in memory
+DEFAULT_MAX_RESIDENT = 2 # Models kept loaded at the same time
+LOAD_TIMEOUT = 300.0 # Seconds; loading a big model from disk can take a while
+REFRESH_INTERVAL = 30.0 # Seconds between /api/ps refreshes while idle
+
+BYTES_PER_GB = 1024 ** 3
+
+
+def list_resident_models(transport=None):
+    """
+    Returns the models Ollama currently holds in memory (/api/ps) as dicts
+    with name, size, size_vram and expires_at.
+    """
+    transport = transport or get_transport()
+    data = transport.get_json("/api/ps")
+    return [
+        {
+            "name": entry.get("name") or entry.get("model"),
+            "size": entry.get("size") or 0,
+            "size_vram": entry.get("size_vram") or 0,
+            "expires_at": entry.get("expires_at"),
+        }
+        for entry in data.get("models", [])
+    ]
+
+
+def format_resident_models(resident):
+    """Short summary like 'llama3.2 3.4 GB (100% GPU), mistral 4.1 GB (CPU)'."""
+    if not resident:
+        return "No models loaded"
+    parts = []
+    for entry in resident:
+        size = entry["size"]
+        if size and entry["size_vram"]:
+            placement = f"{entry['size_vram'] * 100 // size}% GPU"
+        else:
+            placement = "CPU"
+        parts.append(f"{entry['name']} {size / BYTES_PER_GB:.1f} GB ({placement})")
+    total = sum(entry["size"] for entry in resident)
+    return f"Loaded: {', '.join(parts)} | total {total / BYTES_PER_GB:.1f} GB"
+
+
+class ModelResidencyManager(threading.Thread):
+    """
+    Keeps the models the user works with loaded in Ollama.
+    A model is preloaded as soon as it is selected (an empty generate request
+    with keep_alive), so the first prompt does not pay the load time. After
+    every load the residency policy is applied: when more than max_models are
+    resident, or their total size exceeds memory_budget_bytes, the least
+    recently used models are unloaded (keep_alive 0). Models that are
+    generating right now are never unloaded.
+
+    Progress is sent to result_queue as (kind, payload):
+        ("loading", model)           a preload started
+        ("loaded", (model, ms))      the model is in memory
+        ("unloaded", model)          evicted by the policy
+        ("resident", [entries])      current /api/ps list
+        ("error", message)
+    """
+
+    def __init__(self, result_queue, transport=None, keep_alive=DEFAULT_KEEP_ALIVE,
+                 max_models=DEFAULT_MAX_RESIDENT, memory_budget_bytes=None):
+        super().__init__(name="ModelResidency", daemon=True)
+        self.result_queue = result_queue
+        self.transport = transport
+        self.keep_alive = keep_alive
+        self.max_models = max_models
+        self.memory_budget_bytes = memory_budget_bytes # None or 0: no memory limit
+        self.commands = queue.Queue()
+        self._last_used = {} # model -> time.monotonic() of its last selection or use
+        self._in_use = {} # model -> number of running generations
+        self._lock = threading.Lock()
+
+    # --- Called from the UI thread ---
+
+    def preload(self, model):
+        """Loads model in the background; only the newest of several queued preloads runs."""
+        self._touch(model)
+        self.commands.put(("preload", model))
+
+    def begin_use(self, model):
+        """Marks model as generating, which protects it from eviction."""
+        with self._lock:
+            self._in_use[model] = self._in_use.get(model, 0) + 1
+        self._touch(model)
+
+    def end_use(self, model):
+        with self._lock:
+            count = self._in_use.get(model, 0) - 1
+            if count > 0:
+                self._in_use[model] = count
+            else:
+                self._in_use.pop(model, None)
+        self.commands.put(("refresh", None))
+
+    def set_policy(self, max_models=None, memory_budget_bytes=None):
+        """Changes the residency limits and applies them right away."""
+        with self._lock:
+            if max_models is not None:
+                self.max_models = max_models
+            if memory_budget_bytes is not None:
+                self.memory_budget_bytes = memory_budget_bytes
+        self.commands.put(("enforce", None))
+
+    def refresh(self):
+        self.commands.put(("refresh", None))
+
+    def shutdown(self):
+        self.commands.put(("stop", None))
+
+    # --- Worker thread ---
+
+    def _touch(self, model):
+        with self._lock:
+            self._last_used[model] = time.monotonic()
+
+    def run(self):
+        if self.transport is None:
+            self.transport = get_transport()
+
+        while True:
+            try:
+                command, model = self.commands.get(timeout=REFRESH_INTERVAL)
+            except queue.Empty:
+                command, model = "refresh", None # Models expire on the server, keep the display current
+
+            # Several quick selections only load the last one
+            pending = [(command, model)]
+            while True:
+                try:
+                    pending.append(self.commands.get_nowait())
+                except queue.Empty:
+                    break
+            if any(command == "stop" for command, _ in pending):
+                break
+            preloads = [model for command, model in pending if command == "preload"]
+            enforce = any(command == "enforce" for command, _ in pending)
+
+            try:
+                if preloads:
+                    self._load(preloads[-1])
+                    enforce = True
+                resident = list_resident_models(self.transport)
+                if enforce:
+                    resident = self._enforce(resident)
+                self.result_queue.put(("resident", resident))
+            except OllamaError as e:
+                self.result_queue.put(("error", f"Model residency: {e}"))
+
+    def _load(self, model):
+        self.result_queue.put(("loading", model))
+        started = time.perf_counter()
+        self.transport.post_json(
+            "/api/generate",
+            {"model": model, "keep_alive": self.keep_alive},
+            timeout=LOAD_TIMEOUT
+        )
+        self.result_queue.put(("loaded", (model, (time.perf_counter() - started) * 1000.0)))
+
+    def _enforce(self, resident):
+        """Unloads least recently used models until the policy is met; returns what is left."""
+        with self._lock:
+            max_models = self.max_models
+            budget = self.memory_budget_bytes
+            in_use = set(self._in_use)
+            last_used = dict(self._last_used)
+
+        # Models loaded by other clients count as the least recently used
+        candidates = sorted(
+            (entry for entry in resident if entry["name"] not in in_use),
+            key=lambda entry: last_used.get(entry["name"], 0.0)
+        )
+        resident = list(resident)
+        while candidates:
+            over_count = max_models and len(resident) > max_models
+            over_budget = budget and sum(entry["size"] for entry in resident) > budget
+            if not (over_count or over_budget):
+                break
+            victim = candidates.pop(0)
+            if len(resident) == 1 and victim is resident[0]:
+                break # Never unload the only model, even if it is larger than the budget
+            self.transport.post_json("/api/generate", {"model": victim["name"], "keep_alive": 0})
+            resident.remove(victim)
+            self.result_queue.put(("unloaded", victim["name"]))
+        return resident
@@ -0,0 +1,276 @@
+import collections
+import os
+import threading
+import time
+
+from utility.startollama import start_ollama_process
+from utility.transport import get_transport
+
+HEALTH_INTERVAL = 5.0 # Seconds between health checks
+HEALTH_TIMEOUT = 3.0 # A server that does not answer within this is stalled
+FAILURES_BEFORE_RESTART = 3 # Consecutive failed checks before the server is restarted
+RESTART_INITIAL_DELAY = 10.0 # Backoff between restarts: 10s, 20s, 40s ... capped, so a slow start is not cut short
+RESTART_MAX_DELAY = 60.0
+RESOURCE_HISTORY = 120 # Resource samples kept (10 minutes at the health interval)
+STOP_TIMEOUT = 5.0 # Seconds to wait for the server to exit before it is killed
+
+
+class _ProcSampler:
+    """CPU and RSS of a process tree from /proc, for Linux without psutil."""
+
+    def __init__(self):
+        self.clock_ticks = os.sysconf("SC_CLK_TCK")
+        self.page_size = os.sysconf("SC_PAGE_SIZE")
+        self.last = None # (cpu seconds, wall time)
+
+    def _stat(self, pid):
+        with open(f"/proc/{pid}/stat", "r", encoding="ascii") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        # Fields after the command name: state is 0, ppid 1, utime 11, stime 12, rss 21
+        return int(fields[1]), (int(fields[11]) + int(fields[12])) / self.clock_ticks, int(fields[21]) * self.page_size
+
+    def tree(self, pid):
+        """pid and all its descendants; model runners are children of the server."""
+        parents = {}
+        for entry in os.listdir("/proc"):
+            if entry.isdigit():
+                try:
+                    parents[int(entry)] = self._stat(entry)[0]
+                except (OSError, ValueError, IndexError):
+                    continue
+        pids = [pid]
+        for candidate in pids:
+            pids.extend(child for child, parent in parents.items() if parent == candidate)
+        return pids
+
+    def sample(self, pid):
+        cpu_seconds = 0.0
+        rss = 0
+        for member in self.tree(pid):
+            try:
+                _, cpu, member_rss = self._stat(member)
+            except (OSError, ValueError, IndexError):
+                continue
+            cpu_seconds += cpu
+            rss += member_rss
+        now = time.monotonic()
+        cpu_percent = None
+        if self.last is not None and now > self.last[1]:
+            cpu_percent = max(0.0, (cpu_seconds - self.last[0]) / (now - self.last[1]) * 100.0)
+        self.last = (cpu_seconds, now)
+        return cpu_percent, rss
+
+
+class _PsutilSampler:
+    """CPU and RSS of a process tree through psutil (all platforms)."""
+
+    def __init__(self, psutil):
+        self.psutil = psutil
+        self.processes = {} # pid -> Process, kept so cpu_percent() measures since the last call
+
+    def sample(self, pid):
+        try:
+            root = self.psutil.Process(pid)
+            members = [root] + root.children(recursive=True)
+        except self.psutil.Error:
+            return None, 0
+        cpu_percent = 0.0
+        rss = 0
+        current = {}
+        for member in members:
+            process = self.processes.get(member.pid, member)
+            current[member.pid] = process
+            try:
+                cpu_percent += process.cpu_percent(None)
+                rss += process.memory_info().rss
+            except self.psutil.Error:
+                continue
+        self.processes = current
+        return cpu_percent, rss
+
+
+def _make_sampler():
+    try:
+        import psutil # Optional
+        return _PsutilSampler(psutil)
+    except ImportError:
+        pass
+    if os.path.isdir("/proc"):
+        return _ProcSampler()
+    return None
+
+
+def find_server_pid():
+    """Finds the pid of a running `ollama serve` we did not start, or None."""
+    try:
+        import psutil
+        for process in psutil.process_iter(["name", "cmdline"]):
+            name = (process.info["name"] or "").lower()
+            if name.startswith("ollama") and "runner" not in (process.info["cmdline"] or []):
+                return process.pid
+        return None
+    except ImportError:
+        pass
+    if not os.path.isdir("/proc"):
+        return None
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/cmdline", "rb") as f:
+                arguments = f.read().split(b"\0")
+        except OSError:
+            continue
+        if arguments and os.path.basename(arguments[0]).startswith(b"ollama") and b"serve" in arguments:
+            return int(entry)
+    return None
+
+
+def _stop_process(process):
+    """Terminates a server process, killing it if it does not exit in time."""
+    if process is None or process.poll() is not None:
+        return
+    try:
+        process.terminate()
+        process.wait(timeout=STOP_TIMEOUT)
+    except Exception:
+        pass
+    if process.poll() is None:
+        process.kill() # Force kill if necessary
+
+
+def format_bytes(value):
+    return f"{value / 1024 ** 3:.1f} GB" if value >= 1024 ** 3 else f"{value / 1024 ** 2:.0f} MB"
+
+
+def format_server_status(status):
+    """One line for the status bar, e.g. 'Ollama: healthy (3 ms) | CPU 12% | RSS 4.1 GB (peak 5.0 GB)'."""
+    parts = [f"Ollama: {status['state']}"]
+    if status.get("latency_ms") is not None and status["state"] == "healthy":
+        parts[0] += f" ({status['latency_ms']:.0f} ms)"
+    if status.get("cpu_percent") is not None:
+        parts.append(f"CPU {status['cpu_percent']:.0f}%")
+    if status.get("rss_bytes"):
+        parts.append(f"RSS {format_bytes(status['rss_bytes'])} (peak {format_bytes(status['peak_rss_bytes'])})")
+    if status.get("restarts"):
+        parts.append(f"restarts {status['restarts']}")
+    return " | ".join(parts)
+
+
+class OllamaSupervisor(threading.Thread):
+    """
+    Watches the Ollama server for the whole session.
+    Every HEALTH_INTERVAL it checks that the server answers, and samples CPU
+    and resident memory of the server and its model runners (psutil if
+    installed, /proc otherwise). When the server exits or fails
+    FAILURES_BEFORE_RESTART checks in a row it is restarted, with
+    exponential backoff between attempts, if restarting is allowed. A
+    server started here logs to log_path, a rotating file.
+
+    Events are sent to event_queue as (kind, payload):
+        ("status", {...})        state, latency_ms, cpu_percent, rss_bytes, peak_rss_bytes, restarts
+        ("down", message)        the server failed, a restart follows if allowed (once per outage)
+        ("restarted", restarts)  the server answers again after an outage
+    """
+
+    def __init__(self, event_queue, process=None, transport=None, log_path=None, can_restart=True):
+        super().__init__(name="OllamaSupervisor", daemon=True)
+        self.event_queue = event_queue
+        self.process = process # Popen of a server we started; only that one is stopped on shutdown
+        self.transport = transport
+        self.log_path = log_path
+        self.can_restart = can_restart
+        self.restarts = 0
+        self.samples = collections.deque(maxlen=RESOURCE_HISTORY) # (time, cpu_percent, rss_bytes)
+        self.peak_rss = 0
+        self._failures = 0
+        self._down = False # Set while an outage lasts, until the server answers again
+        self._restart_delay = RESTART_INITIAL_DELAY
+        self._next_restart = 0.0
+        self._stop_event = threading.Event()
+        self._process_lock = threading.Lock() # A restart and shutdown() never overlap
+        self._sampler = _make_sampler()
+        self._pid = process.pid if process is not None else None
+
+    def shutdown(self):
+        """Stops supervising and terminates the server if it was started by the application."""
+        with self._process_lock:
+            self._stop_event.set() # From here on no server is started
+        if self.is_alive():
+            # A check running now may still be stopping a stalled server
+            self.join(timeout=HEALTH_TIMEOUT + STOP_TIMEOUT + 1)
+        with self._process_lock:
+            _stop_process(self.process)
+            self.process = None
+
+    def run(self):
+        if self.transport is None:
+            self.transport = get_transport()
+        if self._pid is None:
+            self._pid = find_server_pid()
+
+        while not self._stop_event.wait(HEALTH_INTERVAL):
+            exited = self.process is not None and self.process.poll() is not None
+            started = time.perf_counter()
+            healthy = self.transport.is_alive(timeout=HEALTH_TIMEOUT)
+            latency_ms = (time.perf_counter() - started) * 1000.0
+
+            if healthy:
+                if exited:
+                    # A server answers, just not the one we started (e.g. a restart lost the port to it)
+                    self.process = None
+                    self._pid = find_server_pid()
+                if self._down:
+                    self.event_queue.put(("restarted", self.restarts))
+                    self._down = False
+                self._failures = 0
+                self._restart_delay = RESTART_INITIAL_DELAY
+                state = "healthy"
+            else:
+                self._failures += 1
+                state = "exited" if exited else "not responding"
+                if exited or self._failures >= FAILURES_BEFORE_RESTART:
+                    if not self._down: # Reported once per outage
+                        self.event_queue.put(("down", f"Ollama server {state}."))
+                        self._down = True
+                    if self._maybe_restart():
+                        state = "restarting"
+
+            cpu_percent, rss = self._sample()
+            self.event_queue.put(("status", {
+                "state": state,
+                "latency_ms": latency_ms,
+                "cpu_percent": cpu_percent,
+                "rss_bytes": rss,
+                "peak_rss_bytes": self.peak_rss,
+                "restarts": self.restarts,
+            }))
+
+    def _maybe_restart(self):
+        """Restarts the server once the backoff delay has passed; True if it was restarted."""
+        if not self.can_restart or time.monotonic() < self._next_restart:
+            return False
+        _stop_process(self.process) # Stalled; replace it
+        with self._process_lock:
+            if self._stop_event.is_set():
+                return False # The application is closing; do not leave a new server behind
+            process = start_ollama_process(self.log_path)
+            self.restarts += 1
+            self._next_restart = time.monotonic() + self._restart_delay
+            self._restart_delay = min(self._restart_delay * 2, RESTART_MAX_DELAY)
+            if process is None:
+                return False
+            self.process = process
+            self._pid = process.pid
+        return True
+
+    def _sample(self):
+        if self._sampler is None or self._pid is None:
+            return None, 0
+        try:
+            cpu_percent, rss = self._sampler.sample(self._pid)
+        except OSError:
+            return None, 0
+        self.peak_rss = max(self.peak_rss, rss)
+        self.samples.append((time.time(), cpu_percent, rss))
+        return cpu_percent, rss
@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+DEFAULT_CACHE_MAX_BYTES = 50 * 1024 * 1024 # Size limit of the cache directory
+REPLAY_CHUNK_CHARS = 24 # Cached answers are replayed in pieces of about this size
+
+
+def is_deterministic(options):
+    """Only answers for temperature 0 or a fixed seed can be served from the cache."""
+    return options.get("temperature") == 0 or options.get("seed") is not None
+
+
+def split_for_replay(text, chunk_chars=REPLAY_CHUNK_CHARS):
+    """Splits a cached answer into token-like pieces for the streaming path."""
+    return [text[i:i + chunk_chars] for i in range(0, len(text), chunk_chars)]
+
+
+class ResponseCache:
+    """
+    Disk-backed cache of complete LLM answers, one JSON file per entry.
+    Keys cover the model name and digest, the prompt, the conversation
+    context and the generation options. The file modification time is the
+    LRU clock: a hit touches the file, and when the directory grows past
+    max_bytes the least recently used entries are deleted.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        # Sizes and access times of the existing entries
+        self._entries = {}
+        for entry in os.scandir(directory):
+            if entry.name.endswith(".json"):
+                stat = entry.stat()
+                self._entries[entry.name[:-5]] = [stat.st_size, stat.st_mtime]
+        self._total_bytes = sum(size for size, _ in self._entries.values())
+
+    @staticmethod
+    def make_key(model, digest, prompt, context, options):
+        """Builds the cache key of a request."""
+        material = json.dumps(
+            {"model": model, "digest": digest, "prompt": prompt, "context": context, "options": options},
+            sort_keys=True
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Returns the cached {"response": ..., "info": ...} for key, or None."""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            path = self._path(key)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+                now = time.time()
+                os.utime(path, (now, now))
+            except (OSError, ValueError):
+                self._forget(key)
+                self.misses += 1
+                return None
+            self._entries[key][1] = now
+            self.hits += 1
+            return entry
+
+    def put(self, key, response, info):
+        """Stores a complete answer and evicts least recently used entries if needed."""
+        data = json.dumps({"response": response, "info": info}).encode("utf-8")
+        with self._lock:
+            path = self._path(key)
+            try:
+                with open(path, "wb") as f:
+                    f.write(data)
+            except OSError:
+                return
+            if key in self._entries:
+                self._total_bytes -= self._entries[key][0]
+            self._entries[key] = [len(data), time.time()]
+            self._total_bytes += len(data)
+            self._evict()
+
+    def stats(self):
+        """Returns hit/miss counters and the current size of the cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+            }
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def _forget(self, key):
+        size, _ = self._entries.pop(key)
+        self._total_bytes -= size
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        if self._total_bytes <= self.max_bytes:
+            return
+        for key in sorted(self._entries, key=lambda k: self._entries[k][1]):
+            if self._total_bytes <= self.max_bytes:
+                break
+            self._forget(key)
@@ -1,31 +1,71 @@
-import requests
-from ollama import Client # For interacting with Ollama
-#import json # For parsing Ollama streaming responses
+from utility.transport import OllamaConnectionError, get_transport
 
+# Fields of the final chunk that are passed on to the receiver
+GENERATION_INFO_KEYS = (
+    "context", "prompt_eval_count", "eval_count",
+    "total_duration", "load_duration", "prompt_eval_duration", "eval_duration"
+)
 
 
-def run_llm_inference(prompt, model, temperature, response_queue):
+
+def run_llm_inference(prompt, model, temperature, response_queue, transport=None, request_id=None, cancel_event=None,
+                      context=None, num_ctx=None, seed=None, keep_alive=None, extra_info=None):
     """
     Queries the local LLM via Ollama (streaming response) and sends words
     to the main process via a queue.
+    When a request_id is given every item is sent as (request_id, token) so the
+    receiver can tell which request it belongs to. A set cancel_event stops the
+    stream after the current chunk.
+    context is the vector returned by a previous turn, so Ollama can continue a
+    conversation without re-evaluating it. Once the stream is done a dict with
+    the final generation info (see GENERATION_INFO_KEYS, plus extra_info) is
+    sent before [END_OF_STREAM].
+    keep_alive tells Ollama how long to keep the model loaded afterwards.
     """
+    def emit(token):
+        response_queue.put(token if request_id is None else (request_id, token))
+
     try:
-        client = Client(host='http://localhost:11434')
-        for chunk in client.generate(
-            model=model,
-            prompt=prompt,
-            options={'temperature': temperature},
-            stream=True # This means we get the response token by token
-        ):
-            if 'response' in chunk:
-                token = chunk['response']
-                response_queue.put(token) 
-            if chunk.get('done'):
-                break 
+        if cancel_event is not None and cancel_event.is_set():
+            return # Cancelled while waiting to run
+        if transport is None:
+            transport = get_transport() # Shared keep-alive connection pool
+        options = {'temperature': temperature}
+        if num_ctx:
+            options['num_ctx'] = num_ctx
+        if seed is not None:
+            options['seed'] = seed
+        payload = {
+            'model': model,
+            'prompt': prompt,
+            'options': options,
+            'stream': True # This means we get the response token by token
+        }
+        if context:
+            payload['context'] = context
+        if keep_alive is not None:
+            payload['keep_alive'] = keep_alive
+        stream = transport.stream_json('/api/generate', payload, cancel_event=cancel_event)
+        try:
+            for chunk in stream:
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                if 'response' in chunk:
+                    token = chunk['response']
+                    emit(token)
+                if chunk.get('done'):
+                    info = dict(extra_info or {})
+                    info.update((key, chunk.get(key)) for key in GENERATION_INFO_KEYS)
+                    emit(info)
+                    break
+        finally:
+            stream.close() # Closes the HTTP response so Ollama stops generating
 
-    except requests.exceptions.ConnectionError:
-        response_queue.put("Error: Could not connect to Ollama server. Is it running?")
+    except OllamaConnectionError:
+        if cancel_event is None or not cancel_event.is_set(): # An aborted stream is a stop, not a failure
+            emit("Error: Could not connect to Ollama server. Is it running?")
     except Exception as e:
-        response_queue.put(f"Error querying LLM: {e}")
+        if cancel_event is None or not cancel_event.is_set():
+            emit(f"Error querying LLM: {e}")
     finally:
-        response_queue.put("[END_OF_STREAM]")
\ No newline at end of file
+        emit("[END_OF_STREAM]")
@@ -1,14 +1,46 @@
 import subprocess
 import os
+import threading
+import logging
+from logging.handlers import RotatingFileHandler
 
-def start_ollama_process():
+LOG_MAX_BYTES = 5 * 1024 * 1024 # Size of one server log file
+LOG_BACKUP_COUNT = 3 # Rotated server log files kept next to the current one
+
+
+def _server_log(log_path):
+    """Returns a logger writing to a rotating server log file."""
+    logger = logging.getLogger("octopus.ollama_server")
+    if not any(getattr(handler, "baseFilename", None) == os.path.abspath(log_path) for handler in logger.handlers):
+        handler = RotatingFileHandler(log_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+def _pump_output(process, log_path):
+    """Copies the server output into the log; reading also keeps the pipe from filling up."""
+    logger = _server_log(log_path)
+    logger.info("--- ollama serve started (pid %s) ---", process.pid)
+    for line in iter(process.stdout.readline, b""):
+        logger.info(line.decode("utf-8", errors="replace").rstrip())
+    process.stdout.close()
+    logger.info("--- ollama serve exited (code %s) ---", process.wait())
+
+
+def start_ollama_process(log_path=None):
     """
     Starts the Ollama server as a background process.
+    With log_path its output goes to a rotating log file, otherwise it is discarded.
     Returns the subprocess Popen object if successful, None otherwise.
     """
     #print("Attempting to start Ollama server...")
     try:
-        cmd = ["ollama", "serve"] 
+        cmd = ["ollama", "serve"]
+        output = subprocess.PIPE if log_path else subprocess.DEVNULL
+        errors = subprocess.STDOUT if log_path else subprocess.DEVNULL
 
         # Use platform-specific methods to detach the process
         if os.name == 'nt':  # Windows
@@ -16,18 +48,20 @@ def start_ollama_process():
             # DETACHED_PROCESS detaches it from the parent process
             process = subprocess.Popen(cmd,
                                     creationflags=subprocess.DETACHED_PROCESS | subprocess.CREATE_NO_WINDOW,
-                                    stdout=subprocess.DEVNULL, 
-                                    stderr=subprocess.DEVNULL) 
+                                    stdout=output,
+                                    stderr=errors)
         else: # Unix-like systems (Linux, macOS)
             process = subprocess.Popen(cmd,
-                                    stdout=subprocess.DEVNULL,
-                                    stderr=subprocess.DEVNULL,
+                                    stdout=output,
+                                    stderr=errors,
                                     preexec_fn=os.setsid) # Detach process group
         #print(f"Ollama server process started with PID: {process.pid}")
+        if log_path:
+            threading.Thread(target=_pump_output, args=(process, log_path), name="OllamaLog", daemon=True).start()
         return process
     except FileNotFoundError:
         #print("Error: 'ollama' command not found. Please ensure Ollama is installed and in your system's PATH.")
         return None
     except Exception as e:
         #print(f"Error starting Ollama server: {e}")
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,130 @@
+import re
+import tkinter as tk
+
+# Patterns are compiled once and shared by every renderer
+HEADER_PATTERN = re.compile(r'^(#{1,3}) (.*)$')
+LIST_ITEM_PATTERN = re.compile(r'^([*-]|\d+[.)]) (.*)$')
+CODE_FENCE_PATTERN = re.compile(r'^\s*```')
+INLINE_PATTERN = re.compile(r'\*\*(.+?)\*\*|\*(.+?)\*|`([^`]+)`')
+
+HEADER_TAGS = {1: "h1", 2: "h2", 3: "h3"}
+
+
+def configure_markdown_tags(text_widget):
+    """Configures the text tags the renderer uses on a text widget."""
+    text_widget.tag_config("bold", font=("Helvetica", 12, "bold"), foreground="black") 
+    text_widget.tag_config("italic", font=("Helvetica", 12, "italic"), foreground="black")
+    text_widget.tag_config("h1", font=("Helvetica", 20, "bold"), foreground="black") 
+    text_widget.tag_config("h2", font=("Helvetica", 18, "bold"), foreground="black") 
+    text_widget.tag_config("h3", font=("Helvetica", 16, "bold"), foreground="black") 
+    text_widget.tag_config("list_item", lmargin1=20, lmargin2=40, foreground="black") 
+    text_widget.tag_config("code", font=("Courier", 12), background="#f0f0f0", lmargin1=20, lmargin2=20)
+
+
+class StreamingMarkdownRenderer:
+    """
+    Incremental Markdown renderer for a Tk text widget.
+    Text is fed in arbitrary pieces while the LLM streams; every line is
+    formatted as soon as its newline arrives, and only the unfinished last
+    line is shown raw. finish() then only has to format that last line.
+    Supports: #, ##, ### for headers, **, * and ` for bold/italic/inline code,
+    -, * and 1. for list items and ``` fenced code blocks.
+    The caller is responsible for putting the widget in the 'normal' state.
+    """
+
+    def __init__(self, text_widget, default_tag, mark_name="md_partial_line"):
+        self.text_widget = text_widget
+        self.default_tag = default_tag
+        self.mark_name = mark_name
+        self.partial_line = ""
+        self.in_code_block = False
+        self.insert_index = tk.END # Where formatted lines go; streaming always appends
+
+    def begin(self):
+        """Marks the current end of the widget as the start of the rendered text."""
+        self.text_widget.mark_set(self.mark_name, "end-1c")
+        self.text_widget.mark_gravity(self.mark_name, tk.LEFT)
+
+    def feed(self, text):
+        """Renders every line completed by text and shows the rest raw."""
+        if "\n" not in text:
+            self.partial_line += text
+            self.text_widget.insert(tk.END, text, self.default_tag)
+            return
+
+        lines = (self.partial_line + text).split("\n")
+        self.partial_line = lines.pop()
+
+        # Swap the raw partial line for the formatted, completed lines
+        self.text_widget.delete(self.mark_name, "end-1c")
+        for line in lines:
+            if self._insert_line(line):
+                self.text_widget.insert(tk.END, "\n")
+        self.text_widget.mark_set(self.mark_name, "end-1c")
+        if self.partial_line:
+            self.text_widget.insert(tk.END, self.partial_line, self.default_tag)
+
+    def finish(self):
+        """Formats the unfinished last line, if any."""
+        if self.partial_line:
+            self.text_widget.delete(self.mark_name, "end-1c")
+            self._insert_line(self.partial_line)
+            self.partial_line = ""
+        self.text_widget.mark_unset(self.mark_name)
+
+    def render(self, markdown_text, index=tk.END):
+        """
+        Renders a complete Markdown text in one go at index, which may be a
+        mark with right gravity to render in front of existing text.
+        """
+        self.insert_index = index
+        lines = markdown_text.split("\n")
+        for number, line in enumerate(lines):
+            if self._insert_line(line) and number < len(lines) - 1:
+                self.text_widget.insert(self.insert_index, "\n")
+        self.insert_index = tk.END
+
+    def _insert_line(self, line):
+        """
+        Inserts one complete line (without its newline) with formatting tags.
+        Returns False for code fences, which are not shown.
+        """
+        widget = self.text_widget
+        default_tag = self.default_tag
+        index = self.insert_index
+
+        if CODE_FENCE_PATTERN.match(line):
+            self.in_code_block = not self.in_code_block
+            return False
+        if self.in_code_block:
+            widget.insert(index, line, ("code", default_tag))
+            return True
+
+        line = line.strip()
+        header = HEADER_PATTERN.match(line)
+        if header:
+            widget.insert(index, header.group(2).strip(), (HEADER_TAGS[len(header.group(1))], default_tag))
+            return True
+        list_item = LIST_ITEM_PATTERN.match(line)
+        if list_item:
+            marker, text = list_item.groups()
+            prefix = "  " if marker in "*-" else f"  {marker} " # Numbered steps keep their numbers
+            widget.insert(index, prefix + text.strip(), ("list_item", default_tag))
+            return True
+
+        # Inline formatting (bold/italic/code) for regular lines
+        position = 0
+        for match in INLINE_PATTERN.finditer(line):
+            if match.start() > position:
+                widget.insert(index, line[position:match.start()], default_tag)
+            bold, italic, code = match.groups()
+            if bold is not None:
+                widget.insert(index, bold, ("bold", default_tag))
+            elif italic is not None:
+                widget.insert(index, italic, ("italic", default_tag))
+            else:
+                widget.insert(index, code, ("code", default_tag))
+            position = match.end()
+        if position < len(line):
+            widget.insert(index, line[position:], default_tag)
+        return True
@@ -0,0 +1,104 @@
+import json
+import threading
+import time
+
+NANOSECONDS_PER_MS = 1e6
+
+
+class GenerationTelemetry:
+    """Timestamps and UI cost of one request, collected while it streams."""
+
+    def __init__(self, model):
+        self.model = model
+        self.sent_at = time.perf_counter()
+        self.first_token_at = None
+        self.finished_at = None
+        self.ui_render_ms = 0.0 # Time spent writing this answer into the chat view
+
+    def token_received(self):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+    def finish(self):
+        self.finished_at = time.perf_counter()
+
+
+def _ns_to_ms(value):
+    return value / NANOSECONDS_PER_MS if value else 0.0
+
+
+def build_metrics(telemetry, info):
+    """
+    Combines the UI-side measurements with the final generation info from
+    Ollama into one flat record.
+    """
+    info = info or {}
+    eval_count = info.get("eval_count") or 0
+    eval_ms = _ns_to_ms(info.get("eval_duration"))
+    prompt_eval_count = info.get("prompt_eval_count") or 0
+    finished_at = telemetry.finished_at or time.perf_counter()
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "model": telemetry.model,
+        "cached": bool(info.get("cached")),
+        "queue_wait_ms": info.get("queue_wait_ms", 0.0),
+        "retrieval_ms": info.get("retrieval_ms", 0.0),
+        "parts": info.get("parts", 0),
+        "map_ms": info.get("map_ms", 0.0),
+        "map_sequential_ms": info.get("map_sequential_ms", 0.0),
+        "load_ms": _ns_to_ms(info.get("load_duration")),
+        "prompt_eval_count": prompt_eval_count,
+        "prompt_eval_ms": _ns_to_ms(info.get("prompt_eval_duration")),
+        "time_to_first_token_ms": (
+            (telemetry.first_token_at - telemetry.sent_at) * 1000.0 if telemetry.first_token_at else None
+        ),
+        "eval_count": eval_count,
+        "eval_ms": eval_ms,
+        "tokens_per_second": eval_count / (eval_ms / 1000.0) if eval_ms else None,
+        "server_total_ms": _ns_to_ms(info.get("total_duration")),
+        "total_ms": (finished_at - telemetry.sent_at) * 1000.0,
+        "ui_render_ms": telemetry.ui_render_ms,
+    }
+
+
+def format_metrics(metrics):
+    """Short one-line summary for the status bar."""
+    parts = [metrics["model"]]
+    if metrics["cached"]:
+        parts.append("cached")
+    if metrics["time_to_first_token_ms"] is not None:
+        parts.append(f"TTFT {metrics['time_to_first_token_ms']:.0f} ms")
+    if metrics["tokens_per_second"]:
+        parts.append(f"{metrics['tokens_per_second']:.1f} tok/s")
+    if metrics["load_ms"] >= 1:
+        parts.append(f"load {metrics['load_ms']:.0f} ms")
+    if metrics["prompt_eval_count"]:
+        parts.append(f"prompt {metrics['prompt_eval_count']} tok in {metrics['prompt_eval_ms']:.0f} ms")
+    if metrics["retrieval_ms"] >= 1:
+        parts.append(f"documents {metrics['retrieval_ms']:.0f} ms")
+    if metrics["parts"]:
+        parts.append(
+            f"{metrics['parts']} parts in {metrics['map_ms'] / 1000.0:.1f} s "
+            f"(one by one {metrics['map_sequential_ms'] / 1000.0:.1f} s)"
+        )
+    if metrics["queue_wait_ms"] >= 1:
+        parts.append(f"queued {metrics['queue_wait_ms']:.0f} ms")
+    parts.append(f"UI {metrics['ui_render_ms']:.0f} ms")
+    return " | ".join(parts)
+
+
+class MetricsLog:
+    """Appends one JSON line per generation to a local file, for tracking regressions per model."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, metrics):
+        line = json.dumps(metrics) + "\n"
+        with self._lock:
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+            except OSError:
+                pass # Telemetry must never break the chat
@@ -0,0 +1,38 @@
+CHUNK_CHARS = 1200 # Target chunk size, about 300 tokens
+CHUNK_OVERLAP = 200 # Characters repeated between neighbouring chunks of one paragraph
+
+
+def chunk_text(text, chunk_chars=CHUNK_CHARS, overlap=CHUNK_OVERLAP):
+    """
+    Splits text into chunks of about chunk_chars, on paragraph boundaries
+    where possible. Paragraphs longer than a chunk are cut with overlap so a
+    sentence on the cut is still complete in one of the two chunks.
+    Returns [(offset, chunk)].
+    """
+    chunks = []
+    current = []
+    current_start = 0
+    current_len = 0
+    position = 0
+    for paragraph in text.split("\n\n"):
+        start = position
+        position += len(paragraph) + 2
+        if not paragraph.strip():
+            continue
+        if current and current_len + len(paragraph) > chunk_chars:
+            chunks.append((current_start, "\n\n".join(current)))
+            current, current_len = [], 0
+        if len(paragraph) > chunk_chars:
+            step = chunk_chars - overlap
+            for offset in range(0, len(paragraph), step):
+                chunks.append((start + offset, paragraph[offset:offset + chunk_chars]))
+                if offset + chunk_chars >= len(paragraph):
+                    break
+            continue
+        if not current:
+            current_start = start
+        current.append(paragraph)
+        current_len += len(paragraph) + 2
+    if current:
+        chunks.append((current_start, "\n\n".join(current)))
+    return chunks
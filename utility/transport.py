@@ -0,0 +1,291 @@
+import json
+import os
+import socket
+import threading
+
+DEFAULT_OLLAMA_URL = "http://localhost:11434"
+CONNECT_TIMEOUT = 2.0 # Seconds to open a connection
+READ_TIMEOUT = 300.0 # Seconds between two chunks of a stream (loading a big model can take a while)
+REQUEST_TIMEOUT = 5.0 # Whole-response timeout of simple JSON requests
+DEFAULT_RETRIES = 2 # Retries for failed connects and idempotent requests
+RETRY_BACKOFF = 0.2 # Seconds, doubled on every retry
+POOL_SIZE = 8 # Keep-alive connections kept open to the server
+
+
+class OllamaError(Exception):
+    """Ollama answered with an error."""
+
+
+class OllamaConnectionError(OllamaError):
+    """The Ollama server could not be reached."""
+
+
+_stream_local = threading.local() # on_request callback of the stream being opened by this thread
+
+
+def _shutdown_connection(connection):
+    """Shuts the socket down; a thread blocked reading from it wakes up with an error."""
+    sock = getattr(connection, "sock", None)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass # Already closed
+
+
+def _make_adapter(pool_size, retry):
+    """
+    HTTPAdapter whose connections report themselves when a request is sent
+    on them, so a stream can be aborted from another thread even before
+    Ollama sends the first byte (while it loads the model or reads the prompt).
+    """
+    from requests.adapters import HTTPAdapter
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    def report(connection):
+        on_request = getattr(_stream_local, "on_request", None)
+        if on_request is not None:
+            on_request(connection)
+
+    class TrackedHTTPConnection(HTTPConnection):
+        def request(self, *args, **kwargs):
+            report(self)
+            return super().request(*args, **kwargs)
+
+    class TrackedHTTPSConnection(HTTPSConnection):
+        def request(self, *args, **kwargs):
+            report(self)
+            return super().request(*args, **kwargs)
+
+    class TrackedHTTPPool(HTTPConnectionPool):
+        ConnectionCls = TrackedHTTPConnection
+
+    class TrackedHTTPSPool(HTTPSConnectionPool):
+        ConnectionCls = TrackedHTTPSConnection
+
+    class TrackingAdapter(HTTPAdapter):
+        def init_poolmanager(self, *args, **kwargs):
+            super().init_poolmanager(*args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = {"http": TrackedHTTPPool, "https": TrackedHTTPSPool}
+
+    return TrackingAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+
+
+def ollama_url_from_env():
+    """
+    Returns the Ollama base URL. OLLAMA_HOST is honoured like the ollama CLI
+    does it ("host", "host:port" or a full URL), so the app and `ollama serve`
+    agree on the address.
+    """
+    host = os.environ.get("OLLAMA_HOST", "").strip()
+    if not host:
+        return DEFAULT_OLLAMA_URL
+    if "://" not in host:
+        host = "http://" + host
+    scheme, _, address = host.partition("://")
+    if ":" not in address.rsplit("]", 1)[-1]:
+        address += ":11434"
+    if address.startswith("0.0.0.0"):
+        address = "localhost" + address[len("0.0.0.0"):] # Bind-all address, connect locally
+    return f"{scheme}://{address}"
+
+
+class OllamaTransport:
+    """
+    One keep-alive HTTP connection pool for all traffic to the Ollama
+    server: model discovery, health checks, preloading and streaming
+    generations. Connects and idempotent requests are retried with backoff;
+    streams are never retried once they started. Streams opened with a
+    cancel_event can be aborted from another thread with abort().
+    """
+
+    def __init__(self, base_url=None, retries=DEFAULT_RETRIES, pool_size=POOL_SIZE):
+        import requests # Imported on first use to keep it off the application startup path
+        from urllib3.util.retry import Retry
+
+        self.base_url = (base_url or ollama_url_from_env()).rstrip("/")
+        self._requests = requests
+        self.session = requests.Session()
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=RETRY_BACKOFF,
+            allowed_methods=("GET", "HEAD"),
+            status_forcelist=(502, 503, 504),
+            raise_on_status=False
+        )
+        self.adapter = _make_adapter(pool_size, retry)
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        self._request_count = 0
+        self._streams = {} # cancel_event -> connections of the streams started with it
+        self._lock = threading.Lock()
+
+    def _url(self, path):
+        return self.base_url + path
+
+    def _count_request(self):
+        with self._lock:
+            self._request_count += 1
+
+    def _request(self, method, path, timeout, **kwargs):
+        self._count_request()
+        try:
+            response = self.session.request(method, self._url(path), timeout=timeout, **kwargs)
+        except self._requests.ConnectionError as e:
+            raise OllamaConnectionError(f"Could not connect to Ollama at {self.base_url}") from e
+        except self._requests.RequestException as e:
+            raise OllamaError(str(e)) from e
+        if response.status_code >= 400:
+            message = _error_message(response)
+            response.close()
+            raise OllamaError(message)
+        return response
+
+    def get_json(self, path, timeout=REQUEST_TIMEOUT):
+        """GET request, returns the decoded JSON body."""
+        response = self._request("GET", path, timeout)
+        try:
+            return response.json()
+        except ValueError as e:
+            raise OllamaError(f"Invalid response from {path}") from e
+
+    def post_json(self, path, payload, timeout=REQUEST_TIMEOUT):
+        """POST request with a JSON body, returns the decoded JSON body."""
+        response = self._request("POST", path, timeout, json=payload)
+        try:
+            return response.json()
+        except ValueError as e:
+            raise OllamaError(f"Invalid response from {path}") from e
+
+    def stream_json(self, path, payload, read_timeout=READ_TIMEOUT, cancel_event=None):
+        """
+        POSTs payload and yields the streamed JSON lines as dicts. Closing the
+        generator closes the HTTP response, which makes Ollama stop generating.
+        With a cancel_event the stream can also be aborted by abort(cancel_event),
+        which does not wait for the next chunk.
+        """
+        connections = []
+
+        def on_request(connection):
+            connections.append(connection)
+            self._register_stream(cancel_event, connection)
+
+        if cancel_event is not None:
+            _stream_local.on_request = on_request
+        try:
+            response = self._request("POST", path, (CONNECT_TIMEOUT, read_timeout), json=payload, stream=True)
+        except OllamaError:
+            self._unregister_stream(cancel_event, connections)
+            raise
+        finally:
+            _stream_local.on_request = None
+        try:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    raise OllamaError(chunk["error"])
+                yield chunk
+        except self._requests.RequestException as e:
+            raise OllamaConnectionError(f"Connection to Ollama lost: {e}") from e
+        finally:
+            self._unregister_stream(cancel_event, connections)
+            response.close()
+
+    def _register_stream(self, cancel_event, connection):
+        with self._lock:
+            self._streams.setdefault(cancel_event, set()).add(connection)
+        if cancel_event.is_set():
+            _shutdown_connection(connection) # Cancelled while the request was being sent
+
+    def _unregister_stream(self, cancel_event, connections):
+        if cancel_event is None:
+            return
+        with self._lock:
+            live = self._streams.get(cancel_event)
+            if live is not None:
+                live.difference_update(connections)
+                if not live:
+                    del self._streams[cancel_event]
+
+    def abort(self, cancel_event):
+        """
+        Closes the connections of all streams started with cancel_event, also
+        while they still wait for Ollama's first chunk. Ollama drops requests
+        whose client went away, so it stops loading, evaluating or generating
+        for them. Set cancel_event first so the readers treat it as a stop.
+        """
+        with self._lock:
+            connections = list(self._streams.get(cancel_event, ()))
+        for connection in connections:
+            _shutdown_connection(connection)
+
+    def is_alive(self, timeout=1.0):
+        """
+        Health check: True when the server answers within timeout. Unlike
+        get_json it is never retried, so a stalled server costs one timeout.
+        """
+        from urllib3 import Timeout
+        from urllib3.exceptions import HTTPError
+
+        self._count_request()
+        try:
+            pool = self.adapter.poolmanager.connection_from_url(self.base_url) # The shared keep-alive pool
+            response = pool.urlopen("GET", "/api/version", retries=False, timeout=Timeout(total=timeout))
+            return response.status < 400
+        except (HTTPError, OSError):
+            return False
+
+    def stats(self):
+        """Connection reuse statistics of the pool."""
+        opened = 0
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                opened += pool.num_connections
+        with self._lock:
+            requests_sent = self._request_count
+        return {
+            "requests": requests_sent,
+            "connections_opened": opened,
+            "connections_reused": max(0, requests_sent - opened),
+        }
+
+    def close(self):
+        self.session.close()
+
+
+def _error_message(response):
+    try:
+        return response.json().get("error") or f"HTTP {response.status_code}"
+    except ValueError:
+        return f"HTTP {response.status_code}"
+
+
+_shared_transport = None
+_shared_lock = threading.Lock()
+
+
+def get_transport():
+    """Returns the transport shared by the whole process, creating it on first use."""
+    global _shared_transport
+    with _shared_lock:
+        if _shared_transport is None:
+            _shared_transport = OllamaTransport()
+        return _shared_transport
+
+
+def configure_transport(base_url=None, retries=DEFAULT_RETRIES):
+    """Replaces the shared transport, e.g. to point at another host."""
+    global _shared_transport
+    with _shared_lock:
+        if _shared_transport is not None:
+            _shared_transport.close()
+        _shared_transport = OllamaTransport(base_url, retries=retries)
+        return _shared_transport